@@ -0,0 +1,123 @@
+"""Microbenchmark of per-tweet cost of feed page serialization.
+
+Compares encoding of the same page of ``GET /tweets``:
+
+* ``response_model`` - the former path: the dict is validated by the
+  response model ``Union[ResponseTweetsGet, ResponseError]``, dumped to
+  JSON-compatible python and encoded by the stdlib ``json``;
+* ``type_adapter`` - validation and encoding by the precompiled
+  ``TypeAdapter`` of the response model in one call;
+* ``orjson`` - the dict encoded as it is by ``orjson`` (``ORJSONResponse``).
+
+* ``snapshot`` - the page of the feed's snapshot, encoded once, closed by
+  the reader's ``liked_by_me`` flags.
+
+Usage (from the repository root, DB_* variables set as for the app)::
+
+    python benchmarks/bench_serialization.py --page-size 100 --likes-per-tweet 20
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+from functools import partial
+from typing import Callable, Dict, List, Union
+
+import orjson
+from pydantic import TypeAdapter
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from tweets.snapshot import FeedPage  # noqa: E402
+from utils.global_schemas import ResponseError, ResponseTweetsGet  # noqa: E402
+
+
+def build_page(page_size: int, likes_per_tweet: int) -> dict:
+    """Function of building the page as ``get_all_tweets_json`` returns it."""
+    return {
+        'result': True,
+        'tweets': [
+            {
+                'id': i_tweet,
+                'content': f'Tweet number {i_tweet} with some text of average length',
+                'attachments': [f'/static/images/ab/cd/{i_tweet:064x}.jpeg'],
+                'author': {'id': i_tweet % 50, 'name': f'user_{i_tweet % 50}'},
+                'like_count': likes_per_tweet,
+                'likes': [
+                    {'user_id': i_user, 'name': f'user_{i_user}'}
+                    for i_user in range(likes_per_tweet)
+                ],
+                'liked_by_me': i_tweet % 2 == 0,
+            }
+            for i_tweet in range(page_size)
+        ],
+        'next_cursor': 'MjAyNC0wMS0wMVQwMDowMDowMHwx',
+    }
+
+
+def get_encoders(page: dict) -> Dict[str, Callable[[dict], bytes]]:
+    """Function of getting the compared encoders of the page."""
+    adapter = TypeAdapter(Union[ResponseTweetsGet, ResponseError])
+    snapshot_page = FeedPage(
+        tweets_json=[
+            {
+                i_key: i_value for i_key, i_value in i_tweet.items()
+                if i_key != 'liked_by_me'
+            }
+            for i_tweet in page['tweets']
+        ],
+        next_cursor=page['next_cursor'],
+    )
+
+    def encode_response_model(page: dict) -> bytes:
+        content = adapter.dump_python(adapter.validate_python(page), mode='json')
+        return json.dumps(content, ensure_ascii=False, separators=(',', ':')).encode()
+
+    def encode_type_adapter(page: dict) -> bytes:
+        return adapter.dump_json(adapter.validate_python(page))
+
+    def encode_snapshot(page: dict) -> bytes:
+        liked_ids = {
+            i_tweet['id'] for i_tweet in page['tweets'] if i_tweet['liked_by_me']
+        }
+        return snapshot_page.encode(liked_ids)
+
+    return {
+        'response_model': encode_response_model,
+        'type_adapter': encode_type_adapter,
+        'orjson': orjson.dumps,
+        'snapshot': encode_snapshot,
+    }
+
+
+def main(args: argparse.Namespace) -> None:
+    """Function of benchmark running."""
+    page: dict = build_page(args.page_size, args.likes_per_tweet)
+    report: dict = {
+        'page_size': args.page_size,
+        'likes_per_tweet': args.likes_per_tweet,
+    }
+    encoded: List[dict] = []
+    for name, encode in get_encoders(page).items():
+        encoded.append(orjson.loads(encode(page)))
+        seconds: float = min(timeit.repeat(
+            partial(encode, page), number=args.iterations, repeat=args.repeat,
+        ))
+        report[name] = {
+            'page_us': round(seconds / args.iterations * 1e6, 2),
+            'tweet_us': round(seconds / args.iterations / args.page_size * 1e6, 3),
+        }
+
+    # Encoders differ by keys order of the models, not by content
+    assert all(i_encoded == encoded[0] for i_encoded in encoded)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--likes-per-tweet', type=int, default=20)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=5)
+    main(parser.parse_args())
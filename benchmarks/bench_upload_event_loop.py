@@ -0,0 +1,152 @@
+"""Benchmark of event-loop latency under concurrent media uploads.
+
+Compares the former upload saving (whole file read into memory and written
+by blocking ``open()/write()`` inside the handler) with the streaming
+pipeline of ``images.service``. A probe task sleeps for a fixed interval
+in the same event loop and records how late it wakes up while uploads
+are served: the lag is the time the loop was blocked. Every upload has
+unique content, so the content-addressed storage writes each of them.
+
+Only the file path of the upload is measured, DB is not used: the staged
+upload is stored as if its media were committed.
+
+Usage (from the repository root, DB_* variables set as for the app)::
+
+    python benchmarks/bench_upload_event_loop.py --uploads 200 --size-kb 4096
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from fastapi import FastAPI, File, UploadFile
+from httpx import ASGITransport, AsyncClient, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from database import run_after_commit  # noqa: E402
+from images import service as images_srv  # noqa: E402
+
+PROBE_INTERVAL: float = 0.001
+BOUNDARY: str = 'bench-upload-boundary'
+JPEG_SIGNATURE: bytes = b'\xff\xd8\xff\xe0'
+
+
+def encode_multipart(payload: bytes) -> bytes:
+    """Function of encoding the upload body once, so the client adds no loop lag."""
+    request = Request(
+        'POST', 'http://bench', files={'file': ('image.jpeg', payload)},
+        headers={'Content-Type': f'multipart/form-data; boundary={BOUNDARY}'},
+    )
+    return request.read()
+
+
+def percentile(values: List[float], share: float) -> float:
+    """Function of getting the nearest-rank percentile."""
+    ordered: List[float] = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+def create_app(images_dir: str) -> FastAPI:
+    """Function of building the app with both upload paths."""
+    app = FastAPI()
+
+    @app.post('/blocking')
+    async def upload_blocking(file: UploadFile = File(...)):
+        path_img: str = os.path.join(images_dir, f'{time.perf_counter_ns()}.jpeg')
+        with open(path_img, 'wb') as f:
+            f.write(file.file.read())
+        return {'result': True}
+
+    @app.post('/streaming')
+    async def upload_streaming(file: UploadFile = File(...)):
+        session = AsyncSession()
+        await images_srv.save_file_to_server(session=session, file_obj=file)
+        run_after_commit(session)
+        return {'result': True}
+
+    return app
+
+
+async def probe_loop_lag(lags: List[float], stop: asyncio.Event) -> None:
+    """Function of recording how late the event loop wakes up the sleeping task."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append((time.perf_counter() - started - PROBE_INTERVAL) * 1000)
+
+
+async def measure(
+        client: AsyncClient,
+        path: str,
+        body: bytes,
+        uploads: int,
+        concurrency: int,
+) -> Dict[str, float]:
+    """Function of measuring event-loop lag and throughput of the upload path."""
+    semaphore = asyncio.Semaphore(concurrency)
+    headers: dict = {'Content-Type': f'multipart/form-data; boundary={BOUNDARY}'}
+
+    # Unique bytes of every upload are right after the file signature
+    offset: int = body.index(JPEG_SIGNATURE) + len(JPEG_SIGNATURE)
+
+    async def upload(number: int) -> None:
+        content: bytes = body[:offset] + number.to_bytes(8, 'big') + body[offset + 8:]
+        async with semaphore:
+            response = await client.post(path, content=content, headers=headers)
+            assert response.status_code == 200, response.text
+
+    lags: List[float] = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(probe_loop_lag(lags, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(upload(i_upload) for i_upload in range(uploads)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe
+
+    return {
+        'uploads_per_second': round(uploads / elapsed, 1),
+        'loop_lag_p50_ms': round(statistics.median(lags), 3),
+        'loop_lag_p99_ms': round(percentile(lags, 0.99), 3),
+        'loop_lag_max_ms': round(max(lags), 3),
+    }
+
+
+async def main(args: argparse.Namespace) -> None:
+    """Function of benchmark running."""
+    body: bytes = encode_multipart(
+        JPEG_SIGNATURE + os.urandom(args.size_kb * 1024 - len(JPEG_SIGNATURE)),
+    )
+    report = {
+        'uploads': args.uploads,
+        'concurrency': args.concurrency,
+        'size_kb': args.size_kb,
+    }
+    with tempfile.TemporaryDirectory() as images_dir:
+        images_srv.IMAGES_DIR = images_dir
+        transport = ASGITransport(app=create_app(images_dir))
+        async with AsyncClient(transport=transport, base_url='http://bench') as client:
+            for name in ('blocking', 'streaming'):
+                # Warming up the thread pool and the page cache
+                await measure(
+                    client, f'/{name}', body, args.concurrency, args.concurrency,
+                )
+                report[name] = await measure(
+                    client, f'/{name}', body, args.uploads, args.concurrency,
+                )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--uploads', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--size-kb', type=int, default=4096)
+    asyncio.run(main(parser.parse_args()))
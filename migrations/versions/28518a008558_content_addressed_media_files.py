@@ -0,0 +1,37 @@
+"""Content addressed media files
+
+Revision ID: 28518a008558
+Revises: 4ab0505f8590
+Create Date: 2024-07-11 10:26:41.307915
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '28518a008558'
+down_revision: Union[str, None] = '4ab0505f8590'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Medias uploaded before keep their '<id>.<ext>' files without references
+    op.create_table('media_files',
+    sa.Column('hash', sa.String(length=64), nullable=False),
+    sa.Column('ref_count', sa.Integer(), server_default='1', nullable=False),
+    sa.PrimaryKeyConstraint('hash')
+    )
+    op.add_column('medias', sa.Column('file_hash', sa.String(length=64), nullable=True))
+    op.create_foreign_key(
+        'medias_file_hash_fkey', 'medias', 'media_files', ['file_hash'], ['hash'],
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('medias_file_hash_fkey', 'medias', type_='foreignkey')
+    op.drop_column('medias', 'file_hash')
+    op.drop_table('media_files')
@@ -0,0 +1,62 @@
+"""Home timelines
+
+Revision ID: 3d9a1c7e5f02
+Revises: b6e7045680c1
+Create Date: 2024-07-04 18:22:09.118342
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3d9a1c7e5f02'
+down_revision: Union[str, None] = 'b6e7045680c1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'users',
+        sa.Column('followers_count', sa.Integer(), server_default='0', nullable=False),
+    )
+    op.create_table('timelines',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('timestamp', sa.DateTime(), nullable=False),
+    sa.Column('tweet_id', sa.Integer(), nullable=False),
+    sa.Column('author_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['author_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['tweet_id'], ['tweets.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'timestamp', 'tweet_id')
+    )
+    op.create_index('ix_timelines_tweet_id', 'timelines', ['tweet_id'], unique=False)
+    op.create_index(
+        'ix_timelines_user_id_author_id',
+        'timelines',
+        ['user_id', 'author_id'],
+        unique=False,
+    )
+
+    # Filling counters and timelines from the existing follow edges
+    op.execute(
+        'UPDATE users SET followers_count = ('
+        'SELECT count(DISTINCT follower_id) FROM followers '
+        'WHERE followers.followed_id = users.id)'
+    )
+    op.execute(
+        'INSERT INTO timelines (user_id, timestamp, tweet_id, author_id) '
+        'SELECT DISTINCT followers.follower_id, tweets.timestamp, tweets.id, '
+        'tweets.user_id '
+        'FROM followers JOIN tweets ON tweets.user_id = followers.followed_id'
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_timelines_user_id_author_id', table_name='timelines')
+    op.drop_index('ix_timelines_tweet_id', table_name='timelines')
+    op.drop_table('timelines')
+    op.drop_column('users', 'followers_count')
@@ -0,0 +1,36 @@
+"""Tweet dependents on delete cascade
+
+Revision ID: 4ab0505f8590
+Revises: 4f6fba2bde30
+Create Date: 2024-07-09 16:03:12.570184
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4ab0505f8590'
+down_revision: Union[str, None] = '4f6fba2bde30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TWEET_DEPENDENT_TABLES: tuple = ('likes', 'medias', 'timelines')
+
+
+def upgrade() -> None:
+    for i_table in TWEET_DEPENDENT_TABLES:
+        op.drop_constraint(f'{i_table}_tweet_id_fkey', i_table, type_='foreignkey')
+        op.create_foreign_key(
+            f'{i_table}_tweet_id_fkey', i_table, 'tweets', ['tweet_id'], ['id'],
+            ondelete='CASCADE',
+        )
+
+
+def downgrade() -> None:
+    for i_table in TWEET_DEPENDENT_TABLES:
+        op.drop_constraint(f'{i_table}_tweet_id_fkey', i_table, type_='foreignkey')
+        op.create_foreign_key(
+            f'{i_table}_tweet_id_fkey', i_table, 'tweets', ['tweet_id'], ['id'],
+        )
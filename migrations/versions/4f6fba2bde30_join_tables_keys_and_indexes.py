@@ -0,0 +1,61 @@
+"""Join tables keys and indexes
+
+Revision ID: 4f6fba2bde30
+Revises: 3d9a1c7e5f02
+Create Date: 2024-07-08 11:47:30.962051
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f6fba2bde30'
+down_revision: Union[str, None] = '3d9a1c7e5f02'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Primary keys are impossible on incomplete or repeated pairs
+    op.execute('DELETE FROM likes WHERE tweet_id IS NULL OR user_id IS NULL')
+    op.execute(
+        'DELETE FROM likes a USING likes b '
+        'WHERE a.ctid < b.ctid AND a.tweet_id = b.tweet_id AND a.user_id = b.user_id'
+    )
+    op.execute('DELETE FROM followers WHERE follower_id IS NULL OR followed_id IS NULL')
+    op.execute(
+        'DELETE FROM followers a USING followers b '
+        'WHERE a.ctid < b.ctid '
+        'AND a.follower_id = b.follower_id AND a.followed_id = b.followed_id'
+    )
+
+    op.create_primary_key('likes_pkey', 'likes', ['tweet_id', 'user_id'])
+    op.create_index('ix_likes_user_id_tweet_id', 'likes', ['user_id', 'tweet_id'])
+    op.create_primary_key('followers_pkey', 'followers', ['follower_id', 'followed_id'])
+    op.create_index(
+        'ix_followers_followed_id_follower_id',
+        'followers',
+        ['followed_id', 'follower_id'],
+    )
+    op.create_index(
+        'ix_tweets_user_id_timestamp_id',
+        'tweets',
+        ['user_id', sa.text('timestamp DESC'), sa.text('id DESC')],
+    )
+    op.create_index('ix_medias_tweet_id', 'medias', ['tweet_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_medias_tweet_id', table_name='medias')
+    op.drop_index('ix_tweets_user_id_timestamp_id', table_name='tweets')
+    op.drop_index('ix_followers_followed_id_follower_id', table_name='followers')
+    op.drop_constraint('followers_pkey', 'followers', type_='primary')
+    op.alter_column('followers', 'follower_id', existing_type=sa.Integer(), nullable=True)
+    op.alter_column('followers', 'followed_id', existing_type=sa.Integer(), nullable=True)
+    op.drop_index('ix_likes_user_id_tweet_id', table_name='likes')
+    op.drop_constraint('likes_pkey', 'likes', type_='primary')
+    op.alter_column('likes', 'tweet_id', existing_type=sa.Integer(), nullable=True)
+    op.alter_column('likes', 'user_id', existing_type=sa.Integer(), nullable=True)
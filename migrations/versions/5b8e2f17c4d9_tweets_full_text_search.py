@@ -0,0 +1,41 @@
+"""Tweets full-text search
+
+Revision ID: 5b8e2f17c4d9
+Revises: 28518a008558
+Create Date: 2024-07-15 11:42:08.614203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b8e2f17c4d9'
+down_revision: Union[str, None] = '28518a008558'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Adding the generated column rewrites the table under an exclusive lock
+    op.add_column('tweets', sa.Column(
+        'content_tsv',
+        postgresql.TSVECTOR(),
+        sa.Computed("to_tsvector('simple', content)", persisted=True),
+        nullable=True,
+    ))
+    op.create_index(
+        'ix_tweets_content_tsv',
+        'tweets',
+        ['content_tsv'],
+        unique=False,
+        postgresql_using='gin',
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tweets_content_tsv', table_name='tweets', postgresql_using='gin')
+    op.drop_column('tweets', 'content_tsv')
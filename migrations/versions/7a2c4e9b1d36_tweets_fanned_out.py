@@ -0,0 +1,46 @@
+"""Tweets fanned out
+
+Revision ID: 7a2c4e9b1d36
+Revises: e3b71d9a4c58
+Create Date: 2024-07-25 10:14:52.604217
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a2c4e9b1d36'
+down_revision: Union[str, None] = 'e3b71d9a4c58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Followers count of authors whose tweets are not fanned out, see timelines.service
+FANOUT_FOLLOWERS_LIMIT: int = 10000
+
+
+def upgrade() -> None:
+    op.add_column(
+        'tweets',
+        sa.Column('is_fanned_out', sa.Boolean(), server_default='true', nullable=False),
+    )
+    # Tweets of the authors which are popular now were merged into feeds at read time
+    op.execute(
+        'UPDATE tweets SET is_fanned_out = false FROM users '
+        'WHERE users.id = tweets.user_id '
+        f'AND users.followers_count > {FANOUT_FOLLOWERS_LIMIT}'
+    )
+    op.create_index(
+        'ix_tweets_not_fanned_out_user_id_timestamp_id',
+        'tweets',
+        ['user_id', sa.text('timestamp DESC'), sa.text('id DESC')],
+        unique=False,
+        postgresql_where=sa.text('is_fanned_out IS false'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tweets_not_fanned_out_user_id_timestamp_id', table_name='tweets')
+    op.drop_column('tweets', 'is_fanned_out')
@@ -0,0 +1,46 @@
+"""Hashtags and trends
+
+Revision ID: 9c4f0a6d2e71
+Revises: 5b8e2f17c4d9
+Create Date: 2024-07-17 16:05:32.471920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c4f0a6d2e71'
+down_revision: Union[str, None] = '5b8e2f17c4d9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Hashtags of existing tweets are not extracted, trends start empty
+    op.create_table('tweet_hashtags',
+    sa.Column('tweet_id', sa.Integer(), nullable=False),
+    sa.Column('tag', sa.String(length=64), nullable=False),
+    sa.Column('timestamp', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['tweet_id'], ['tweets.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('tweet_id', 'tag')
+    )
+    op.create_index(
+        'ix_tweet_hashtags_tag_timestamp', 'tweet_hashtags', ['tag', 'timestamp'],
+        unique=False,
+    )
+    op.create_table('hashtag_counts',
+    sa.Column('resolution', sa.Integer(), nullable=False),
+    sa.Column('bucket', sa.DateTime(), nullable=False),
+    sa.Column('tag', sa.String(length=64), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('resolution', 'bucket', 'tag')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('hashtag_counts')
+    op.drop_index('ix_tweet_hashtags_tag_timestamp', table_name='tweet_hashtags')
+    op.drop_table('tweet_hashtags')
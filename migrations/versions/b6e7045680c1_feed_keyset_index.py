@@ -0,0 +1,35 @@
+"""Feed keyset index
+
+Revision ID: b6e7045680c1
+Revises: e44fbbbf11dc
+Create Date: 2024-07-02 12:10:41.503297
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6e7045680c1'
+down_revision: Union[str, None] = 'e44fbbbf11dc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Keyset pagination compares (timestamp, id) rows, so NULLs are not allowed
+    op.execute("UPDATE tweets SET timestamp = 'epoch' WHERE timestamp IS NULL")
+    op.alter_column('tweets', 'timestamp', existing_type=sa.DateTime(), nullable=False)
+    op.create_index(
+        'ix_tweets_timestamp_id',
+        'tweets',
+        [sa.text('timestamp DESC'), sa.text('id DESC')],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tweets_timestamp_id', table_name='tweets')
+    op.alter_column('tweets', 'timestamp', existing_type=sa.DateTime(), nullable=True)
@@ -0,0 +1,42 @@
+"""Like counts
+
+Revision ID: e3b71d9a4c58
+Revises: 9c4f0a6d2e71
+Create Date: 2024-07-22 11:42:07.318564
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3b71d9a4c58'
+down_revision: Union[str, None] = '9c4f0a6d2e71'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'tweets',
+        sa.Column('like_count', sa.Integer(), server_default='0', nullable=False),
+    )
+    op.execute(
+        'UPDATE tweets SET like_count = counts.count '
+        'FROM (SELECT tweet_id, count(*) AS count FROM likes GROUP BY tweet_id) '
+        'AS counts WHERE tweets.id = counts.tweet_id'
+    )
+    op.create_table('like_count_shards',
+    sa.Column('tweet_id', sa.Integer(), nullable=False),
+    sa.Column('shard', sa.SmallInteger(), autoincrement=False, nullable=False),
+    sa.Column('delta', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['tweet_id'], ['tweets.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('tweet_id', 'shard')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('like_count_shards')
+    op.drop_column('tweets', 'like_count')
@@ -1,13 +1,114 @@
 """Module with environment variables initialization."""
 
-import os
+from typing import List, Literal, Optional
 
 from dotenv import load_dotenv
+from pydantic import model_validator
+from pydantic_settings import BaseSettings
 
 load_dotenv()
 
-DB_HOST = os.environ.get('DB_HOST')
-DB_PORT = os.environ.get('DB_PORT')
-DB_NAME = os.environ.get('DB_NAME')
-DB_USER = os.environ.get('DB_USER')
-DB_PASS = os.environ.get('DB_PASS')
+# Defaults of settings which are not set explicitly, by app's profile
+PROFILES_DEFAULTS: dict = {
+    'dev': {
+        'db_echo': True,
+        'db_pool_size': 5,
+        'db_max_overflow': 5,
+        'db_log_repeated_statements': True,
+    },
+    'prod': {
+        'db_echo': False,
+        'db_pool_size': 20,
+        'db_max_overflow': 10,
+        'db_log_repeated_statements': False,
+    },
+}
+
+
+class Settings(BaseSettings):
+    """App settings. Read from environment variables, case-insensitive."""
+
+    app_profile: Literal['dev', 'prod'] = 'prod'
+
+    db_host: str
+    db_port: int = 5432
+    db_name: str
+    db_user: str
+    db_pass: str
+
+    # Engine and pool
+    db_echo: Optional[bool] = None
+    db_pool_size: Optional[int] = None
+    db_max_overflow: Optional[int] = None
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = False
+
+    # Prepared statements cached by each connection
+    db_statement_cache_size: int = 100
+    # Per-session limit of statements' execution time, 0 disables it
+    db_statement_timeout_ms: int = 5000
+    # PgBouncer in transaction mode: no named prepared statements, no app pool
+    db_pgbouncer: bool = False
+
+    # Logging of statements repeated by a request, which are likely N+1 queries
+    db_log_repeated_statements: Optional[bool] = None
+    # Raising instead of logging when endpoint's query budget is exceeded (tests)
+    db_enforce_query_budgets: bool = False
+
+    # Read replicas as JSON-list of 'host:port', same DB name and credentials
+    db_replicas: List[str] = []
+    # Replicas lagging more are dropped from rotation until they catch up
+    db_replica_max_lag_seconds: float = 10.0
+    db_replica_check_interval_seconds: float = 5.0
+    # Reads of the user go to the primary for this time after user's writes,
+    # by the worker which has served the writes only
+    db_read_your_writes_seconds: float = 5.0
+
+    # Count of likers previewed by entries of the feeds, the full list is paginated
+    feed_likes_preview_size: int = 3
+
+    # Likes are acknowledged at once and written by batches (see likes.queue)
+    likes_write_behind: bool = False
+
+    # Api-keys of admins as JSON-list, they can export all of data
+    admin_api_keys: List[str] = []
+
+    # Bearer token of scrapes of /api/metrics. Without it metrics are served to
+    # anyone, so the endpoint must not be exposed directly (nginx denies it)
+    metrics_token: Optional[str] = None
+
+    @model_validator(mode='after')
+    def apply_profile_defaults(self) -> 'Settings':
+        """Function of filling the unset settings by defaults of the profile."""
+        for i_name, i_value in PROFILES_DEFAULTS[self.app_profile].items():
+            if getattr(self, i_name) is None:
+                setattr(self, i_name, i_value)
+        return self
+
+    @property
+    def database_url(self) -> str:
+        """URL of the app's database."""
+        return self.get_database_url(f'{self.db_host}:{self.db_port}')
+
+    @property
+    def replicas_urls(self) -> List[str]:
+        """URLs of the app's database replicas."""
+        return [self.get_database_url(i_address) for i_address in self.db_replicas]
+
+    def get_database_url(self, address: str) -> str:
+        """Function of building URL of the app's database on the server 'host:port'."""
+        return (
+            f'postgresql+asyncpg://{self.db_user}:{self.db_pass}'
+            f'@{address}/{self.db_name}'
+        )
+
+
+settings = Settings()
+
+# Used by migrations' environment
+DB_HOST = settings.db_host
+DB_PORT = str(settings.db_port)
+DB_NAME = settings.db_name
+DB_USER = settings.db_user
+DB_PASS = settings.db_pass
@@ -1,13 +1,250 @@
-"""Module with database connection."""
+"""Module with database connection.
 
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+Writes and reads of the recently writing users go to the primary, other
+reads may go to read replicas (see ``dependencies.get_read_session``).
+"""
+
+import asyncio
+import itertools
+import time
+import uuid
+from functools import lru_cache
+from typing import Callable, List, Optional
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
+from sqlalchemy.util.queue import AsyncAdaptedQueue
+
+from config import Settings, settings
+from utils.cache import TTLCache
+from utils.metrics import registry
+
+READ_YOUR_WRITES_CACHE_SIZE: int = 100000
+AFTER_COMMIT_KEY: str = 'after_commit'
+AFTER_ROLLBACK_KEY: str = 'after_rollback'
+POOL_WAIT_BUCKETS: tuple = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+# Replica's lag is zero when it streams WAL of the primary and has replayed
+# everything it has received. Lag of a replica without streaming is unknown
+# (NULL): it may have replayed all it received before losing the primary.
+REPLICA_LAG_QUERY: str = (
+    'SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0 '
+    'WHEN NOT EXISTS (SELECT 1 FROM pg_stat_wal_receiver '
+    "WHERE status = 'streaming') THEN NULL "
+    'WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+    'ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp()) END'
+)
+
+
+class PoolWaitStats:
+    """Statistics of checkouts waiting for idle connections of the exhausted pool."""
+
+    def __init__(self) -> None:
+        self.waits: int = 0
+        self.total_wait: float = 0.0
+        self.max_wait: float = 0.0
+        self.histogram = registry.histogram(
+            'db_pool_queue_wait_seconds',
+            'Wait of checkouts for idle connections of the exhausted pool.',
+            buckets=POOL_WAIT_BUCKETS,
+        )
+
+    def record(self, wait: float) -> None:
+        """Function of adding wait of one checkout, in seconds."""
+        self.histogram.observe(value=wait)
+        self.waits += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+
+
+pool_wait_stats = PoolWaitStats()
+
+
+class TimedQueue(AsyncAdaptedQueue):
+    """Queue of the pool's idle connections measuring waits for them."""
+
+    def get(self, block: bool = True, timeout: Optional[float] = None):
+        """Function of taking an idle connection, blocking gets are measured.
+
+        Non-blocking gets (e.g. by ``dispose``) do not wait, so they are not
+        recorded.
+        """
+        if not block:
+            return super().get(block, timeout)
+        started = time.perf_counter()
+        try:
+            return super().get(block, timeout)
+        finally:
+            pool_wait_stats.record(time.perf_counter() - started)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool measuring wait of connections checkout.
+
+    Only checkouts waiting for an idle connection, when the pool and its
+    overflow are exhausted, are measured: opening a new connection is the
+    connect time of Postgres, not a sign of the pool's shortage.
+    Growing wait means the pool is too small for the concurrency of workers,
+    it should be sized together with ``max_connections`` of Postgres.
+    """
+
+    _queue_class = TimedQueue
+
+
+def get_prepared_statement_name() -> str:
+    """Function of naming prepared statements uniquely across server connections."""
+    return f'__asyncpg_{uuid.uuid4()}__'
+
+
+def get_engine_options(app_settings: Settings) -> dict:
+    """Function of building options of the engine by settings.
+
+    In PgBouncer mode the pool is PgBouncer's and prepared statements are not
+    reused, statement_timeout must be set for the DB role, since PgBouncer
+    rejects it as a startup parameter.
+    """
+    if app_settings.db_pgbouncer:
+        return {
+            'echo': app_settings.db_echo,
+            'poolclass': NullPool,
+            'connect_args': {
+                'statement_cache_size': 0,
+                'prepared_statement_cache_size': 0,
+                'prepared_statement_name_func': get_prepared_statement_name,
+            },
+        }
+
+    return {
+        'echo': app_settings.db_echo,
+        'poolclass': TimedQueuePool,
+        'pool_size': app_settings.db_pool_size,
+        'max_overflow': app_settings.db_max_overflow,
+        'pool_timeout': app_settings.db_pool_timeout,
+        'pool_recycle': app_settings.db_pool_recycle,
+        'pool_pre_ping': app_settings.db_pool_pre_ping,
+        'connect_args': {
+            'prepared_statement_cache_size': app_settings.db_statement_cache_size,
+            'server_settings': {
+                'statement_timeout': str(app_settings.db_statement_timeout_ms),
+            },
+        },
+    }
+
 
-from config import DB_HOST, DB_NAME, DB_PASS, DB_PORT, DB_USER
+class ReplicaSet:
+    """Engines of read replicas taken in turn.
 
-DATABASE_URL = f'postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
+    Replicas lagging more than ``max_lag`` seconds or unavailable are out of
+    rotation until the next check shows they are fine.
+    """
 
-engine = create_async_engine(DATABASE_URL, echo=True)
+    def __init__(self, engines: List[AsyncEngine], max_lag: float):
+        self.max_lag = max_lag
+        self.set_engines(engines)
+
+    def set_engines(self, engines: List[AsyncEngine]) -> None:
+        """Function of replacing replicas' engines, all of them are in rotation."""
+        self.engines: List[AsyncEngine] = list(engines)
+        self.healthy: List[AsyncEngine] = list(engines)
+        self._turns = itertools.count()
+
+    def choose(self) -> Optional[AsyncEngine]:
+        """Function of getting engine of the next replica in rotation."""
+        healthy: List[AsyncEngine] = self.healthy
+        if not healthy:
+            return None
+        return healthy[next(self._turns) % len(healthy)]
+
+    async def check_lag(self) -> None:
+        """Function of checking replicas' lag and updating the rotation."""
+        healthy: List[AsyncEngine] = []
+        for i_engine in self.engines:
+            try:
+                lag: Optional[float] = await asyncio.wait_for(
+                    get_replica_lag(i_engine), timeout=self.max_lag,
+                )
+            except (OSError, SQLAlchemyError, asyncio.TimeoutError):
+                continue
+            if lag is not None and lag <= self.max_lag:
+                healthy.append(i_engine)
+        self.healthy = healthy
+
+    async def run_lag_checks(self, interval: float) -> None:
+        """Function of checking replicas' lag periodically, until cancelled."""
+        while True:
+            await self.check_lag()
+            await asyncio.sleep(interval)
+
+
+async def get_replica_lag(replica_engine: AsyncEngine) -> Optional[float]:
+    """Function of getting lag of the replica in seconds, None when it is unknown."""
+    async with replica_engine.connect() as conn:
+        res = await conn.exec_driver_sql(REPLICA_LAG_QUERY)
+        lag = res.scalar()
+        return None if lag is None else float(lag)
+
+
+@lru_cache(maxsize=16)
+def get_autocommit_engine(bind: AsyncEngine) -> AsyncEngine:
+    """Function of getting the engine committing every statement by itself.
+
+    The engine shares the pool of ``bind``: its statements are run without
+    BEGIN and COMMIT round trips.
+    """
+    return bind.execution_options(isolation_level='AUTOCOMMIT')
+
+
+def after_commit(session: AsyncSession, callback: Callable[[], None]) -> None:
+    """Function of deferring the callback until writes of the session are committed.
+
+    Callbacks are run by ``dependencies.get_session`` and are dropped when
+    the request fails.
+    """
+    session.info.setdefault(AFTER_COMMIT_KEY, []).append(callback)
+
+
+def after_rollback(session: AsyncSession, callback: Callable[[], None]) -> None:
+    """Function of deferring the callback until writes of the session are rolled back.
+
+    Callbacks are run by ``dependencies.get_session`` when the request fails
+    and are dropped when it is committed.
+    """
+    session.info.setdefault(AFTER_ROLLBACK_KEY, []).append(callback)
+
+
+def run_after_commit(session: AsyncSession) -> None:
+    """Function of running callbacks deferred until the commit."""
+    session.info.pop(AFTER_ROLLBACK_KEY, None)
+    for i_callback in session.info.pop(AFTER_COMMIT_KEY, ()):
+        i_callback()
+
+
+def run_after_rollback(session: AsyncSession) -> None:
+    """Function of running callbacks deferred until the rollback."""
+    session.info.pop(AFTER_COMMIT_KEY, None)
+    for i_callback in session.info.pop(AFTER_ROLLBACK_KEY, ()):
+        i_callback()
+
+
+DATABASE_URL = settings.database_url
+
+engine = create_async_engine(DATABASE_URL, **get_engine_options(settings))
 async_session = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
 
+replicas = ReplicaSet(
+    engines=[
+        create_async_engine(i_url, **get_engine_options(settings))
+        for i_url in settings.replicas_urls
+    ],
+    max_lag=settings.db_replica_max_lag_seconds,
+)
+
+# Api-keys of users who have written recently, their reads go to the primary.
+# Writers are known only by the worker which served the write: reads served by
+# other workers may go to a replica which has not the write yet.
+recent_writers: TTLCache[bool] = TTLCache(
+    maxsize=READ_YOUR_WRITES_CACHE_SIZE, ttl=settings.db_read_your_writes_seconds,
+)
+
 Base = declarative_base()
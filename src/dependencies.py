@@ -1,32 +1,178 @@
 """Module with dependencies of FastAPI app."""
 
 
-from typing import Optional
+import secrets
+from functools import partial
+from typing import Callable, Literal, Optional
 
-from fastapi import Depends, Header
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import Depends, Header, Request
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
 
-from database import async_session
+from config import settings
+from database import (
+    async_session,
+    engine,
+    get_autocommit_engine,
+    recent_writers,
+    replicas,
+    run_after_commit,
+    run_after_rollback,
+)
+from exceptions import AccessDeniedError
 from users.exceptions import UserNotFoundError
-from users.models import User
-from users.service import get_user_by_api_key
+from users.schemas import UserPrincipal
+from users.service import get_principal_by_api_key
 
 
-async def get_session() -> AsyncSession:
-    """Function of async sessions getting."""
-    async with async_session() as session:
+SAFE_METHODS: tuple[str] = ('GET', 'HEAD', 'OPTIONS')
+TransactionMode = Literal['unit_of_work', 'autocommit']
+DEFAULT_TRANSACTION_MODE: TransactionMode = 'unit_of_work'
+
+
+def transaction_mode(mode: TransactionMode) -> Callable:
+    """Decorator of declaring how statements of the endpoint are committed.
+
+    * ``unit_of_work`` (default) - all of statements of the request run in one
+      transaction, committed once after the endpoint has returned;
+    * ``autocommit`` - every statement is committed by itself, without BEGIN
+      and COMMIT round trips. It suits reads and single-statement writes.
+    """
+    def decorator(endpoint: Callable) -> Callable:
+        endpoint.transaction_mode = mode
+        return endpoint
+
+    return decorator
+
+
+def get_transaction_mode(request: Request) -> TransactionMode:
+    """Function of getting transaction mode of the requested endpoint."""
+    endpoint: Optional[Callable] = getattr(request.scope.get('route'), 'endpoint', None)
+    return getattr(endpoint, 'transaction_mode', DEFAULT_TRANSACTION_MODE)
+
+
+def get_engine() -> AsyncEngine:
+    """Function of getting engine of the primary."""
+    return engine
+
+
+async def get_session(
+        request: Request,
+        bind: AsyncEngine = Depends(get_engine),
+) -> AsyncSession:
+    """Function of async sessions getting, one transaction per request.
+
+    Services only flush: the transaction is committed when the endpoint has
+    returned and rolled back when it has raised, so a request either writes
+    everything or nothing. Callbacks of ``database.after_commit`` are run
+    after the commit, ones of ``database.after_rollback`` when the request fails.
+    """
+    if get_transaction_mode(request) == 'autocommit':
+        async with async_session(bind=get_autocommit_engine(bind)) as session:
+            try:
+                yield session
+            except BaseException:
+                run_after_rollback(session)
+                raise
+            run_after_commit(session)
+        return
+
+    async with async_session(bind=bind) as session:
+        try:
+            async with session.begin():
+                yield session
+        except BaseException:
+            run_after_rollback(session)
+            raise
+        run_after_commit(session)
+
+
+async def get_read_session(
+        request: Request,
+        session: AsyncSession = Depends(get_session),
+) -> AsyncSession:
+    """Function of async sessions getting for read-only endpoints.
+
+    Session of a read replica, or of the primary when no replica is in
+    rotation or the user has written recently (reads own writes). Recent
+    writes are known per worker process only.
+    """
+    replica_engine: Optional[AsyncEngine] = None
+    if not await is_recent_writer(request):
+        replica_engine = replicas.choose()
+
+    if replica_engine is None:
         yield session
+        return
+
+    if get_transaction_mode(request) == 'autocommit':
+        replica_engine = get_autocommit_engine(replica_engine)
+    async with async_session(bind=replica_engine) as replica_session:
+        yield replica_session
+
+
+def get_read_session_factory() -> Callable[[], AsyncSession]:
+    """Function of getting factory of sessions for streaming reads.
+
+    Streamed responses outlive the request's dependencies, so their sessions
+    are opened by the streams. Sessions are of a read replica when one is
+    in rotation.
+    """
+    replica_engine: Optional[AsyncEngine] = replicas.choose()
+    if replica_engine is None:
+        return async_session
+
+    return partial(async_session, bind=replica_engine)
+
+
+async def is_recent_writer(request: Request) -> bool:
+    """Function of checking that the user of the request has written recently.
+
+    Async, so the check runs on the event loop as all of other uses of
+    ``recent_writers``: the cache is not thread-safe.
+    """
+    return bool(recent_writers.get(request.headers.get('api-key')))
+
+
+async def remember_writer(request: Request) -> None:
+    """Function of marking the user of a writing request as recent writer."""
+    api_key: Optional[str] = request.headers.get('api-key')
+    if api_key and request.method not in SAFE_METHODS:
+        recent_writers.set(api_key, True)
 
 
 async def get_user_by_api_key_dependencie(
         api_key: str = Header(None),
-        session: AsyncSession = Depends(get_session)):
-    """Function of getting user by api-key."""
+        session: AsyncSession = Depends(get_session)) -> UserPrincipal:
+    """Function of getting authenticated user by api-key.
+
+    Only id and name are resolved. Endpoints which need user's relationships
+    should load exactly them by themselves.
+    """
     if not api_key:
         raise UserNotFoundError(message='Passed api-key is empty')
 
-    user: Optional[User] = await get_user_by_api_key(session=session, api_key=api_key)
+    user: Optional[UserPrincipal] = await get_principal_by_api_key(
+        session=session, api_key=api_key,
+    )
     if not user:
         raise UserNotFoundError(message='User with the passed api-key is not exist')
 
     return user
+
+
+async def check_admin_api_key(api_key: str = Header(None)) -> None:
+    """Function of checking that api-key is one of the admins' keys."""
+    if not api_key or api_key not in settings.admin_api_keys:
+        raise AccessDeniedError(message='Passed api-key is not an admin key')
+
+
+async def check_metrics_token(authorization: str = Header(None)) -> None:
+    """Function of checking the bearer token of metrics' scrapes, when it is set."""
+    if settings.metrics_token is None:
+        return
+
+    expected: str = f'Bearer {settings.metrics_token}'
+    if not authorization or not secrets.compare_digest(
+        authorization.encode(), expected.encode(),
+    ):
+        raise AccessDeniedError(message='Passed token is not the metrics token')
@@ -32,6 +32,34 @@ async def relationship_exception_handler(request: Request, exc: RelationshipErro
     )
 
 
+class InvalidCursorError(BaseError):
+    """Exception class of passing malformed pagination cursor."""
+
+    pass
+
+
+async def invalid_cursor_exception_handler(request: Request, exc: InvalidCursorError):
+    """InvalidCursorError handler."""
+    return JSONResponse(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        content=exc.content,
+    )
+
+
+class AccessDeniedError(BaseError):
+    """Exception class of requesting admin's endpoints without admin's api-key."""
+
+    pass
+
+
+async def access_denied_exception_handler(request: Request, exc: AccessDeniedError):
+    """AccessDeniedError handler."""
+    return JSONResponse(
+        status_code=status.HTTP_403_FORBIDDEN,
+        content=exc.content,
+    )
+
+
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     """Validation error hadler."""
     return JSONResponse(
@@ -0,0 +1,79 @@
+"""Module with endpoints of admins' exports of all of data."""
+
+from typing import Callable, Optional
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from dependencies import check_admin_api_key, get_read_session_factory
+from exports.service import (
+    EXPORT_MEDIA_TYPES,
+    ExportFormat,
+    stream_follows,
+    stream_tweets,
+)
+from metrics.service import query_budget
+
+router = APIRouter(
+    prefix='/exports',
+    tags=['Exports'],
+    dependencies=[Depends(check_admin_api_key)],
+)
+
+
+def get_export_headers(name: str, export_format: ExportFormat) -> dict:
+    """Function of getting headers of the exported file's response."""
+    return {'Content-Disposition': f'attachment; filename="{name}.{export_format}"'}
+
+
+@router.get('/tweets')
+@query_budget(1)
+async def export_tweets(
+    export_format: ExportFormat = Query('ndjson', alias='format'),
+    after_id: int = Query(0, ge=0),
+    until_id: Optional[int] = Query(None, ge=0),
+    session_factory: Callable[[], AsyncSession] = Depends(get_read_session_factory),
+):
+    """Endpoint of GET-request of exporting tweets with id in (after_id, until_id].
+
+    Tweets are ordered by id: pass id of the last received tweet as
+    ``after_id`` to resume the export.
+    """
+    return StreamingResponse(
+        stream_tweets(
+            session_factory=session_factory,
+            export_format=export_format,
+            after_id=after_id,
+            until_id=until_id,
+        ),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers=get_export_headers(name='tweets', export_format=export_format),
+    )
+
+
+@router.get('/follows')
+@query_budget(1)
+async def export_follows(
+    export_format: ExportFormat = Query('ndjson', alias='format'),
+    after_id: int = Query(0, ge=0),
+    after_followed_id: int = Query(0, ge=0),
+    until_id: Optional[int] = Query(None, ge=0),
+    session_factory: Callable[[], AsyncSession] = Depends(get_read_session_factory),
+):
+    """Endpoint of GET-request of exporting follow edges of followers up to until_id.
+
+    Edges are ordered by (follower_id, followed_id): pass the last received
+    edge as ``after_id`` and ``after_followed_id`` to resume the export.
+    """
+    return StreamingResponse(
+        stream_follows(
+            session_factory=session_factory,
+            export_format=export_format,
+            after_id=after_id,
+            after_followed_id=after_followed_id,
+            until_id=until_id,
+        ),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers=get_export_headers(name='follows', export_format=export_format),
+    )
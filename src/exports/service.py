@@ -0,0 +1,166 @@
+"""Module with streaming exports of tweets and follows.
+
+Rows are read by a server-side cursor in batches of ``EXPORT_BATCH_SIZE``
+and every batch is encoded to one chunk of the response, so memory use
+does not depend on size of the tables. Rows are ordered by their keys:
+an interrupted export is resumed from the last received key.
+"""
+
+import csv
+import io
+import json
+from typing import AsyncIterator, Callable, Iterable, List, Literal, Optional, Tuple
+
+import orjson
+from sqlalchemy import Select, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from tweets.models import Tweet
+from tweets.service import select_tweets_json
+from users.models import followers
+
+EXPORT_BATCH_SIZE: int = 1000
+ExportFormat = Literal['ndjson', 'csv']
+EXPORT_MEDIA_TYPES: dict = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+TWEETS_CSV_COLUMNS: Tuple[str, ...] = (
+    'id', 'timestamp', 'author_id', 'author_name', 'content', 'attachments',
+    'like_count', 'likes',
+)
+FOLLOWS_CSV_COLUMNS: Tuple[str, ...] = ('follower_id', 'followed_id')
+
+
+def select_tweets_export(after_id: int, until_id: Optional[int]) -> Select:
+    """Function of building the query of tweets with id in (after_id, until_id].
+
+    Unlike the feed's entries the exported tweets list all of their likers.
+    """
+    query = select_tweets_json(likes_limit=None).filter(Tweet.id > after_id)
+    if until_id is not None:
+        query = query.filter(Tweet.id <= until_id)
+    return query.order_by(Tweet.id)
+
+
+def select_follows_export(
+        after_id: int,
+        after_followed_id: int,
+        until_id: Optional[int],
+) -> Select:
+    """Function of building the query of follows after the (follower, followed) key.
+
+    ``until_id`` is the last follower's id of the range.
+    """
+    query = select(followers.c.follower_id, followers.c.followed_id).filter(
+        tuple_(followers.c.follower_id, followers.c.followed_id) >
+        tuple_(after_id, after_followed_id),
+    )
+    if until_id is not None:
+        query = query.filter(followers.c.follower_id <= until_id)
+    return query.order_by(followers.c.follower_id, followers.c.followed_id)
+
+
+def get_tweet_record(row) -> dict:
+    """Function of getting the exported tweet: the feed's JSON with the timestamp."""
+    return {**row.tweet, 'timestamp': row.timestamp.isoformat()}
+
+
+def encode_tweets(rows: Iterable, export_format: ExportFormat) -> bytes:
+    """Function of encoding the batch of tweets' rows."""
+    records: List[dict] = [get_tweet_record(i_row) for i_row in rows]
+    if export_format == 'ndjson':
+        return encode_ndjson(records)
+
+    return encode_csv([
+        (
+            i_record['id'],
+            i_record['timestamp'],
+            i_record['author']['id'],
+            i_record['author']['name'],
+            i_record['content'],
+            json.dumps(i_record['attachments']),
+            i_record['like_count'],
+            json.dumps([i_like['user_id'] for i_like in i_record['likes']]),
+        )
+        for i_record in records
+    ])
+
+
+def encode_follows(rows: Iterable, export_format: ExportFormat) -> bytes:
+    """Function of encoding the batch of follows' rows."""
+    if export_format == 'ndjson':
+        return encode_ndjson([
+            {'follower_id': i_row.follower_id, 'followed_id': i_row.followed_id}
+            for i_row in rows
+        ])
+    return encode_csv([tuple(i_row) for i_row in rows])
+
+
+def encode_ndjson(records: List[dict]) -> bytes:
+    """Function of encoding records as lines of JSON."""
+    return b''.join(
+        orjson.dumps(i_record, option=orjson.OPT_APPEND_NEWLINE) for i_record in records
+    )
+
+
+def encode_csv(records: List[tuple]) -> bytes:
+    """Function of encoding records as lines of CSV."""
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator='\n').writerows(records)
+    return buffer.getvalue().encode()
+
+
+def encode_csv_header(columns: Tuple[str, ...]) -> bytes:
+    """Function of encoding the header line of CSV."""
+    return encode_csv([columns])
+
+
+async def stream_rows(
+        session_factory: Callable[[], AsyncSession],
+        query: Select,
+) -> AsyncIterator[list]:
+    """Function of reading rows of the query by a server-side cursor in batches.
+
+    The session is opened by the stream itself: it lives as long as the
+    response is sent, not as the request's dependencies.
+    """
+    async with session_factory() as session:
+        result = await session.stream(
+            query.execution_options(yield_per=EXPORT_BATCH_SIZE),
+        )
+        async for i_rows in result.partitions():
+            yield i_rows
+
+
+async def stream_tweets(
+        session_factory: Callable[[], AsyncSession],
+        export_format: ExportFormat,
+        after_id: int = 0,
+        until_id: Optional[int] = None,
+) -> AsyncIterator[bytes]:
+    """Function of streaming tweets with authors, likes and attachments, by id."""
+    if export_format == 'csv':
+        yield encode_csv_header(TWEETS_CSV_COLUMNS)
+
+    query = select_tweets_export(after_id=after_id, until_id=until_id)
+    async for i_rows in stream_rows(session_factory=session_factory, query=query):
+        yield encode_tweets(rows=i_rows, export_format=export_format)
+
+
+async def stream_follows(
+        session_factory: Callable[[], AsyncSession],
+        export_format: ExportFormat,
+        after_id: int = 0,
+        after_followed_id: int = 0,
+        until_id: Optional[int] = None,
+) -> AsyncIterator[bytes]:
+    """Function of streaming follow edges by (follower_id, followed_id)."""
+    if export_format == 'csv':
+        yield encode_csv_header(FOLLOWS_CSV_COLUMNS)
+
+    query = select_follows_export(
+        after_id=after_id, after_followed_id=after_followed_id, until_id=until_id,
+    )
+    async for i_rows in stream_rows(session_factory=session_factory, query=query):
+        yield encode_follows(rows=i_rows, export_format=export_format)
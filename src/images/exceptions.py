@@ -24,6 +24,12 @@ class FileMalwareError(BaseError):
     pass
 
 
+class FilesCountError(BaseError):
+    """Exceptions when too many files are uploaded at once."""
+
+    pass
+
+
 async def file_size_exception_handler(request: Request, exc: FileSizeError):
     """FileSizeError handler."""
     return JSONResponse(
@@ -46,3 +52,11 @@ async def file_malware_exception_handler(request: Request, exc: FileMalwareError
         status_code=status.HTTP_400_BAD_REQUEST,
         content=exc.content,
     )
+
+
+async def files_count_exception_handler(request: Request, exc: FilesCountError):
+    """FilesCountError handler."""
+    return JSONResponse(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        content=exc.content,
+    )
@@ -5,6 +5,19 @@ from sqlalchemy.orm import relationship
 
 from database import Base
 
+
+class MediaFile(Base):
+    """DB model of the stored file shared by medias with the same content."""
+
+    __tablename__ = 'media_files'
+
+    hash = Column(String(64), primary_key=True)
+    ref_count = Column(Integer, nullable=False, default=1, server_default='1')
+
+    def __repr__(self):
+        return f'{self.hash}, {self.ref_count}'
+
+
 class Media(Base):
     """DB media's model."""
 
@@ -12,7 +25,10 @@ class Media(Base):
 
     id = Column(Integer, primary_key=True)
     name = Column(String, nullable=False)
-    tweet_id = Column(Integer, ForeignKey('tweets.id'), nullable=True)
+    file_hash = Column(String(64), ForeignKey('media_files.hash'), nullable=True)
+    tweet_id = Column(
+        Integer, ForeignKey('tweets.id', ondelete='CASCADE'), nullable=True, index=True,
+    )
     tweet = relationship('Tweet', back_populates='attachments')
 
     def __repr__(self):
@@ -1,15 +1,17 @@
 """Module with endpoints of actions with medias."""
 
-from typing import Union
+import asyncio
+from typing import List, Tuple, Union
 
 from fastapi import APIRouter, Depends, UploadFile, File
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from dependencies import get_session, get_user_by_api_key_dependencie
-from images.exceptions import FileMalwareError, FileSizeError, FileTypeError
+from images.exceptions import FilesCountError
 from images import service as srv
-from users.models import User
-from utils.global_schemas import ResponseMediaPost, ResponseError
+from metrics.service import query_budget
+from users.schemas import UserPrincipal
+from utils.global_schemas import ResponseMediaPost, ResponseMediasPost, ResponseError
 
 router = APIRouter(prefix='/medias', tags=['Medias'])
 
@@ -18,26 +20,56 @@ router = APIRouter(prefix='/medias', tags=['Medias'])
     '',
     response_model=Union[ResponseMediaPost, ResponseError],
 )
+@query_budget(2)
 async def upload_media(
     file: UploadFile = File(...),
     session: AsyncSession = Depends(get_session),
-    user: User = Depends(get_user_by_api_key_dependencie),
+    user: UserPrincipal = Depends(get_user_by_api_key_dependencie),
 ):
     """Endpoint of POST-request of adding new media."""
-    if not srv.is_filesize_ok(file_obj=file):
-        raise FileSizeError(message='Size of the file is larger than 5 MB')
-    
-    if not srv.is_filetype_ok(file_obj=file):
-        raise FileTypeError(message='Not allowed file extension. ' \
-                            'Alowed extensions: jpg, jpeg, png, tiff, heic')
-    
-    if srv.is_file_consist_malware(file_obj=file):
-        raise FileMalwareError(message='The file consist malware')
-    
+    srv.check_upload_file(file_obj=file)
+
+    # Saving media to server, size and signature are checked while hashing
+    file_hash, filename = await srv.save_file_to_server(session=session, file_obj=file)
+
     # Adding media to DB
-    media_obj = await srv.add_media_to_db(session=session, filename=file.filename)
+    media_id: int = await srv.add_media_to_db(
+        session=session, name=filename, file_hash=file_hash,
+    )
+
+    return {'result': True, 'media_id': media_id}
+
+
+@router.post(
+    '/batch',
+    response_model=Union[ResponseMediasPost, ResponseError],
+)
+@query_budget(2)
+async def upload_medias(
+    files: List[UploadFile] = File(...),
+    session: AsyncSession = Depends(get_session),
+    user: UserPrincipal = Depends(get_user_by_api_key_dependencie),
+):
+    """Endpoint of POST-request of adding batch of new medias by one transaction."""
+    if len(files) > srv.MEDIAS_BATCH_SIZE:
+        raise FilesCountError(
+            message=f'Too many files. Allowed files count: {srv.MEDIAS_BATCH_SIZE}',
+        )
+
+    for i_file in files:
+        srv.check_upload_file(file_obj=i_file)
+
+    # Saving medias to server concurrently, all of them are staged before a failure
+    # is raised, so each staged file is removed with the rollback
+    saved_files: List[Union[Tuple[str, str], BaseException]] = await asyncio.gather(
+        *(srv.save_file_to_server(session=session, file_obj=i_file) for i_file in files),
+        return_exceptions=True,
+    )
+    for i_saved in saved_files:
+        if isinstance(i_saved, BaseException):
+            raise i_saved
+
+    # Adding medias to DB
+    media_ids: List[int] = await srv.add_medias_to_db(session=session, files=saved_files)
 
-    # Saving media to server
-    srv.save_file_to_server(filename=media_obj.name, file_obj=file)
-    
-    return {'result': True, 'media_id': media_obj.id}
+    return {'result': True, 'media_ids': media_ids}
@@ -1,17 +1,57 @@
-"""Module with DB-operations with medias."""
+"""Module with DB-operations with medias.
 
+Uploads are read from the spooled request body by a worker thread, so the
+event loop is never blocked by file I/O. The size limit and the file
+signature are checked while hashing the content. Bodies over the limit
+are rejected by nginx before they are spooled, the check here covers
+requests which do not pass through it.
+
+Files are content-addressed: the name is built from SHA-256 of the content
+(``ab/cd/<hash>.<ext>``), so it never changes and the same content is
+stored once. Each media references its file in ``media_files``, which
+counts the references.
+
+An upload is staged next to its file (a hard link, when the content is
+stored already) and moved to the file's name only after the media is
+committed; staged files of failed requests are removed. Files whose
+references are released are deleted together with their rows, and removed
+right after the commit.
+"""
+
+import hashlib
 import os
-from pathlib import Path
-from typing import List
+import shutil
+import tempfile
+import uuid
+from collections import Counter
+from functools import partial
+from typing import BinaryIO, Dict, List, Tuple
 
 from fastapi import UploadFile
-from sqlalchemy import update
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, update
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from images.models import Media
+from database import after_commit, after_rollback
+from images.exceptions import FileMalwareError, FileSizeError, FileTypeError
+from images.models import Media, MediaFile
 
 BYTES_IN_MEGABYTE: int = 1048576
+MAX_FILE_SIZE: int = BYTES_IN_MEGABYTE * 5
+UPLOAD_CHUNK_SIZE: int = 64 * 1024
+IMAGES_DIR: str = os.path.join('..', 'static', 'images')
+MEDIAS_BATCH_SIZE: int = 10
 ALLOWED_FILE_EXTENSIONS: tuple[str] = ('png', 'jpg', 'jpeg', 'tiff', 'heic')
+FILE_SIGNATURES: Dict[str, Tuple[bytes, ...]] = {
+    'png': (b'\x89PNG\r\n\x1a\n',),
+    'jpg': (b'\xff\xd8\xff',),
+    'jpeg': (b'\xff\xd8\xff',),
+    'tiff': (b'II*\x00', b'MM\x00*'),
+}
+FILE_EXTENSIONS_ALIASES: Dict[str, str] = {'jpg': 'jpeg'}
+HEIC_BRANDS: Tuple[bytes, ...] = (b'heic', b'heix', b'hevc', b'hevx', b'mif1', b'msf1')
+SIGNATURE_SIZE: int = 12
 
 
 async def update_medias(
@@ -22,39 +62,240 @@ async def update_medias(
     """Function of tweet_id parameter updating."""
     stmt = update(Media).where(Media.id.in_(media_ids)).values(tweet_id=new_tweet_id)
     await session.execute(stmt)
-    await session.commit()
 
 
-async def add_media_to_db(session: AsyncSession, filename: 'str') -> Media:
-    """Function of adding media to DB."""
-    media_obj = Media(name=filename)
-    session.add(media_obj)
-    await session.commit()
-    media_obj.name = str(media_obj.id) + Path(filename).suffix
-    await session.commit()
+async def add_media_to_db(session: AsyncSession, name: str, file_hash: str) -> int:
+    """Function of adding media of the stored file to DB. Returns id of the media."""
+    media_ids: List[int] = await add_medias_to_db(
+        session=session, files=[(file_hash, name)],
+    )
+
+    return media_ids[0]
+
+
+async def add_medias_to_db(
+        session: AsyncSession,
+        files: List[Tuple[str, str]],
+) -> List[int]:
+    """Function of adding medias of the stored files (hash, name) to DB.
+
+    All of medias are inserted and reference counts of their files are
+    incremented by one statement. Rows of files are locked in order of hashes,
+    so concurrent batches do not deadlock. Returns ids of medias in order of files.
+    """
+    refs_count: Counter = Counter(i_hash for i_hash, _ in files)
+    file_refs = insert(MediaFile).values([
+        {'hash': i_hash, 'ref_count': i_count}
+        for i_hash, i_count in sorted(refs_count.items())
+    ])
+    file_refs = file_refs.on_conflict_do_update(
+        index_elements=[MediaFile.hash],
+        set_={'ref_count': MediaFile.ref_count + file_refs.excluded.ref_count},
+    ).returning(MediaFile.hash).cte('file_refs')
+    res = await session.execute(
+        insert(Media).
+        add_cte(file_refs).
+        values([{'name': i_name, 'file_hash': i_hash} for i_hash, i_name in files]).
+        returning(Media.id)
+    )
+    # Ids are taken from the sequence in order of inserted rows
+    media_ids: List[int] = sorted(res.scalars().all())
+
+    return media_ids
+
+
+async def release_media_files(
+        session: AsyncSession,
+        files: List[Tuple[str, str]],
+) -> None:
+    """Function of deleting the stored files (hash, name) which have no references.
+
+    Rows are deleted by one statement, the files are removed after the commit.
+    """
+    await session.execute(
+        delete(MediaFile).filter(MediaFile.hash.in_([i_hash for i_hash, _ in files]))
+    )
+    after_commit(session, partial(remove_stored_files, [i_name for _, i_name in files]))
+
+
+async def save_file_to_server(
+        session: AsyncSession,
+        file_obj: UploadFile,
+) -> Tuple[str, str]:
+    """Function of saving the uploaded file to the server by hash of its content.
+
+    The file is staged and stored when the session is committed.
+    Raises FileSizeError or FileTypeError on invalid file.
+    Returns hash and name of the file.
+    """
+    file_hash, filename, staged_path = await run_in_threadpool(
+        stage_upload_file,
+        src_file=file_obj.file,
+        extension=get_file_extension(file_obj.filename),
+    )
+    path_img: str = os.path.join(IMAGES_DIR, filename)
+    after_commit(session, partial(store_staged_file, staged_path, path_img))
+    after_rollback(session, partial(discard_file, staged_path))
+
+    return file_hash, filename
+
+
+def stage_upload_file(src_file: BinaryIO, extension: str) -> Tuple[str, str, str]:
+    """Function of staging the spooled upload next to the file of its content.
+
+    The stored file of the same content is linked instead of written, so it
+    is not lost when its last reference is released meanwhile.
+    Blocking, runs in a worker thread.
+    Returns hash, name of the file and path of the staged file.
+    """
+    file_hash: str = hash_upload_file(src_file=src_file, extension=extension)
+    filename: str = build_file_name(file_hash=file_hash, extension=extension)
+    path_img: str = os.path.join(IMAGES_DIR, filename)
+    try:
+        staged_path: str = link_stored_file(path=path_img)
+    except OSError:
+        staged_path = write_upload_file(src_file=src_file, path=path_img)
+
+    return file_hash, filename, staged_path
+
+
+def hash_upload_file(src_file: BinaryIO, extension: str) -> str:
+    """Function of hashing the spooled upload with size and signature checking."""
+    check_file_size(src_file.seek(0, os.SEEK_END))
+    src_file.seek(0)
+    digest = hashlib.sha256()
+    read: int = 0
+    while chunk := src_file.read(UPLOAD_CHUNK_SIZE):
+        if not read:
+            check_file_signature(chunk[:SIGNATURE_SIZE], extension)
+        read += len(chunk)
+        check_file_size(read)
+        digest.update(chunk)
 
-    return media_obj
+    if not read:
+        check_file_signature(b'', extension)
 
+    return digest.hexdigest()
 
-def save_file_to_server(filename: str, file_obj: UploadFile) -> None:
-    """Function of file saving to the server."""
-    path_dir: str = os.path.join('..', 'static', 'images')
+
+def build_file_name(file_hash: str, extension: str) -> str:
+    """Function of building sharded name of the file: ``ab/cd/<hash>.<ext>``."""
+    extension = FILE_EXTENSIONS_ALIASES.get(extension, extension)
+    return f'{file_hash[:2]}/{file_hash[2:4]}/{file_hash}.{extension}'
+
+
+def link_stored_file(path: str) -> str:
+    """Function of linking the stored file to a staged path, returns the path."""
+    staged_path: str = f'{path}.{uuid.uuid4().hex}.part'
+    os.link(path, staged_path)
+    return staged_path
+
+
+def write_upload_file(src_file: BinaryIO, path: str) -> str:
+    """Function of writing the spooled upload to a staged path next to the path.
+
+    The upload rolled over to a disk file is copied by the kernel with
+    ``copy_file_range``, the in-memory one is copied by chunks.
+    Returns the staged path, it is moved to the path by ``store_staged_file``.
+    """
+    path_dir: str = os.path.dirname(path)
     os.makedirs(path_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(suffix='.part', dir=path_dir)
+    try:
+        with open(fd, 'wb') as tmp_file:
+            if getattr(src_file, '_rolled', False):
+                copy_file_range(src_file.fileno(), tmp_file)
+            else:
+                src_file.seek(0)
+                shutil.copyfileobj(src_file, tmp_file, UPLOAD_CHUNK_SIZE)
+    except BaseException:
+        discard_file(tmp_path)
+        raise
+
+    return tmp_path
+
+
+def store_staged_file(staged_path: str, path: str) -> None:
+    """Function of moving the staged file to the path.
+
+    Renaming is no-op when both are links of the same file, then the staged
+    link is removed.
+    """
+    os.replace(staged_path, path)
+    discard_file(staged_path)
+
+
+def discard_file(path: str) -> None:
+    """Function of removing the partially written or staged file."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def remove_stored_files(names: List[str]) -> None:
+    """Function of removing the stored files without references."""
+    for i_name in names:
+        discard_file(os.path.join(IMAGES_DIR, i_name))
+
+
+def copy_file_range(src_fd: int, dst_file: BinaryIO) -> None:
+    """Function of copying the whole file in the kernel without user-space buffers."""
+    size: int = os.fstat(src_fd).st_size
+    offset: int = 0
+    try:
+        while offset < size:
+            copied: int = os.copy_file_range(
+                src_fd, dst_file.fileno(), size - offset, offset,
+            )
+            if not copied:
+                break
+            offset += copied
+    except (AttributeError, OSError):
+        # Not supported by the platform or the filesystems: copy the rest by chunks
+        dst_file.seek(offset)
+        while chunk := os.pread(src_fd, UPLOAD_CHUNK_SIZE, offset):
+            dst_file.write(chunk)
+            offset += len(chunk)
+
+
+def check_file_size(size: int) -> None:
+    """Function of file size checking while reading."""
+    if size > MAX_FILE_SIZE:
+        raise FileSizeError(message='Size of the file is larger than 5 MB')
+
+
+def check_file_signature(head: bytes, extension: str) -> None:
+    """Function of checking the file's magic bytes against its extension."""
+    if not is_signature_ok(head=head, extension=extension):
+        raise FileTypeError(message='Content of the file does not match its extension')
+
+
+def is_signature_ok(head: bytes, extension: str) -> bool:
+    """Function of file signature checking."""
+    if extension == 'heic':
+        return head[4:8] == b'ftyp' and head[8:12] in HEIC_BRANDS
+    return head.startswith(FILE_SIGNATURES.get(extension, ()))
+
+
+def get_file_extension(filename: str) -> str:
+    """Function of getting extension of the file."""
+    return filename.split('.')[-1]
 
-    path_img: str = os.path.join(path_dir, filename)
-    with open(path_img, 'wb') as f:
-        f.write(file_obj.file.read())
 
+def check_upload_file(file_obj: UploadFile) -> None:
+    """Function of the uploaded file checking before reading."""
+    if not is_filetype_ok(file_obj=file_obj):
+        raise FileTypeError(message='Not allowed file extension. '
+                            'Alowed extensions: jpg, jpeg, png, tiff, heic')
 
-def is_filesize_ok(file_obj: UploadFile) -> bool:
-    """Function of file size checking."""
-    return file_obj.size <= BYTES_IN_MEGABYTE * 5
+    if is_file_consist_malware(file_obj=file_obj):
+        raise FileMalwareError(message='The file consist malware')
 
 
 def is_filetype_ok(file_obj: UploadFile) -> bool:
     """Function of file extension checking."""
-    file_extension: str = file_obj.filename.split('.')[-1]
-    return file_extension in ALLOWED_FILE_EXTENSIONS
+    return get_file_extension(file_obj.filename) in ALLOWED_FILE_EXTENSIONS
 
 
 def is_file_consist_malware(file_obj: UploadFile) -> bool:
@@ -1,13 +1,37 @@
 """Module with DB likes' models."""
 
-from sqlalchemy import Column, Integer, ForeignKey, Table
+from sqlalchemy import Column, Index, Integer, ForeignKey, SmallInteger, Table
 
 from database import Base
 
+# Count of rows of deltas of every tweet's likes counter
+LIKE_COUNT_SHARDS: int = 16
+
 
 likes = Table(
     'likes',
     Base.metadata,
-    Column('tweet_id', Integer, ForeignKey('tweets.id')),
-    Column('user_id', Integer, ForeignKey('users.id')),
+    Column(
+        'tweet_id',
+        Integer,
+        ForeignKey('tweets.id', ondelete='CASCADE'),
+        primary_key=True,
+    ),
+    Column('user_id', Integer, ForeignKey('users.id'), primary_key=True),
+    Index('ix_likes_user_id_tweet_id', 'user_id', 'tweet_id'),
+)
+
+# Deltas of ``tweets.like_count`` not folded yet: likers of the tweet are spread
+# over ``LIKE_COUNT_SHARDS`` rows, so concurrent likes do not wait for one lock
+like_count_shards = Table(
+    'like_count_shards',
+    Base.metadata,
+    Column(
+        'tweet_id',
+        Integer,
+        ForeignKey('tweets.id', ondelete='CASCADE'),
+        primary_key=True,
+    ),
+    Column('shard', SmallInteger, primary_key=True, autoincrement=False),
+    Column('delta', Integer, nullable=False),
 )
@@ -0,0 +1,181 @@
+"""Module with the write-behind queue of likes.
+
+In write-behind mode (``settings.likes_write_behind``) likes and unlikes
+are acknowledged at once and only their intents are queued. The queue
+keeps the last intent per (tweet, user): opposing intents of a like storm
+collapse to one row of the batch. Intents are flushed every
+``LIKES_FLUSH_INTERVAL`` seconds by one statement per batch, the rest
+is flushed on shutdown.
+
+Writers read their writes: reads of a user having queued intents wait
+for the flush of them, a few milliseconds, but no longer than
+``LIKES_SYNC_TIMEOUT`` seconds. Intents of the batch are not lost when
+its flush fails transiently (e.g. the DB is unavailable), they are queued
+again unless newer ones replaced them, and their readers wait for the next
+flush. Failed flushes are logged and counted by ``likes_flush_failures_total``.
+
+A batch rejected by the data of its rows (e.g. a like of a tweet deleted
+meanwhile) is written again row by row, so the rows which cannot be written
+are dropped instead of being retried forever; they are logged and counted
+by ``likes_dropped_total``.
+"""
+
+import asyncio
+import logging
+from typing import Callable, Dict, List, Set, Tuple
+
+from sqlalchemy.exc import DataError, IntegrityError, SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import async_session
+from likes.service import write_likes
+from tweets.snapshot import feed_snapshot
+from utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+LIKES_FLUSH_INTERVAL: float = 0.005
+LIKES_SYNC_TIMEOUT: float = 1.0
+
+# Errors caused by the written rows, retrying them can not succeed
+PERMANENT_ERRORS = (DataError, IntegrityError)
+
+LikeKey = Tuple[int, int]
+
+LIKES_FLUSH_FAILURES = registry.counter(
+    'likes_flush_failures_total', 'Count of failed flushes of the queue of likes.',
+)
+LIKES_DROPPED = registry.counter(
+    'likes_dropped_total', 'Count of queued intents of likes which can not be written.',
+)
+
+
+class LikesBatch:
+    """Last like's intents of (tweet_id, user_id) keys, True means like."""
+
+    __slots__ = ('intents', 'user_ids', 'flushed')
+
+    def __init__(self):
+        self.intents: Dict[LikeKey, bool] = {}
+        self.user_ids: Set[int] = set()
+        # Set when the batch is written, or its flush has failed
+        self.flushed = asyncio.Event()
+
+
+class LikesQueue:
+    """Queue of like's intents flushed to DB by batches."""
+
+    def __init__(self, session_factory: Callable[[], AsyncSession]):
+        self.session_factory = session_factory
+        self.batch = LikesBatch()
+        self.flushing = LikesBatch()
+        self._flush_lock = asyncio.Lock()
+
+    def put(self, tweet_id: int, user_id: int, is_liked: bool) -> None:
+        """Function of queueing the intent, it replaces the user's previous one."""
+        self.batch.intents[(tweet_id, user_id)] = is_liked
+        self.batch.user_ids.add(user_id)
+
+    async def write(self, intents: Dict[LikeKey, bool]) -> Set[int]:
+        """Function of writing the intents by one transaction, returns ids of tweets."""
+        added: List[LikeKey] = []
+        deleted: List[LikeKey] = []
+        for i_key, i_is_liked in intents.items():
+            (added if i_is_liked else deleted).append(i_key)
+
+        async with self.session_factory() as session, session.begin():
+            return await write_likes(session=session, added=added, deleted=deleted)
+
+    async def write_rows(self) -> Set[int]:
+        """Function of writing intents of the flushing batch one by one.
+
+        Written and dropped intents leave the batch, so the rest of it is
+        queued again when a row fails transiently.
+        """
+        tweet_ids: Set[int] = set()
+        for i_key, i_is_liked in list(self.flushing.intents.items()):
+            try:
+                tweet_ids |= await self.write({i_key: i_is_liked})
+            except PERMANENT_ERRORS as exc:
+                LIKES_DROPPED.inc()
+                logger.warning('Queued like %s of (tweet, user) dropped: %s', i_key, exc)
+            del self.flushing.intents[i_key]
+        return tweet_ids
+
+    async def flush(self) -> None:
+        """Function of writing the queued intents by one transaction.
+
+        Flushes are serialized: when the function returns, every intent
+        queued before the call is written or dropped.
+        """
+        async with self._flush_lock:
+            if not self.batch.intents:
+                return
+            self.flushing, self.batch = self.batch, LikesBatch()
+
+            try:
+                try:
+                    tweet_ids: Set[int] = await self.write(self.flushing.intents)
+                except PERMANENT_ERRORS as exc:
+                    logger.warning(
+                        'Flush of %d queued likes rejected, writing them one by one: %s',
+                        len(self.flushing.intents), exc,
+                    )
+                    tweet_ids = await self.write_rows()
+            except BaseException:
+                for i_key, i_is_liked in self.flushing.intents.items():
+                    if i_key not in self.batch.intents:
+                        self.batch.intents[i_key] = i_is_liked
+                        self.batch.user_ids.add(i_key[1])
+                raise
+            finally:
+                self.flushing.flushed.set()
+                self.flushing = LikesBatch()
+
+            for i_tweet_id in tweet_ids:
+                feed_snapshot.on_tweet_changed(tweet_id=i_tweet_id)
+
+    async def wait_flushed(self, user_id: int) -> None:
+        """Function of waiting until the user has no queued intents."""
+        while True:
+            for i_batch in (self.batch, self.flushing):
+                if user_id in i_batch.user_ids:
+                    await i_batch.flushed.wait()
+                    break
+            else:
+                return
+
+    async def sync_user(self, user_id: int, timeout: float = LIKES_SYNC_TIMEOUT) -> None:
+        """Function of waiting for the flush of the user's intents before user's reads.
+
+        Reads do not flush the queue themselves: intents of all of waiting
+        readers are written by the next periodic flush. Intents of a failed
+        flush are queued again, so their readers wait for the next one,
+        until the timeout: then the user reads without the queued intents.
+        """
+        try:
+            await asyncio.wait_for(self.wait_flushed(user_id), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                'Queued likes of user %d are not flushed in %s seconds', user_id, timeout,
+            )
+
+    def clear(self) -> None:
+        """Function of dropping the queued intents."""
+        self.batch = LikesBatch()
+
+    async def run_flushing(self, interval: float) -> None:
+        """Function of flushing the queue periodically, until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush()
+            except (OSError, SQLAlchemyError) as exc:
+                LIKES_FLUSH_FAILURES.inc()
+                logger.warning(
+                    'Flush of %d queued likes failed, retrying: %s',
+                    len(self.batch.intents), exc,
+                )
+
+
+likes_queue = LikesQueue(session_factory=async_session)
@@ -0,0 +1,244 @@
+"""Module with DB-operations with likes.
+
+Likes are added and deleted by single statements against the primary key
+of ``likes``, so the cost does not depend on user's likes history and
+concurrent repeated requests can't both succeed.
+
+The same statement adds +1 or -1 to the tweet's likes counter. Deltas are
+spread by liker over ``LIKE_COUNT_SHARDS`` rows of ``like_count_shards``,
+so concurrent likes of a viral tweet do not serialize on one row's lock,
+and are folded to ``tweets.like_count`` periodically. The count is the
+folded value plus the pending deltas, so it is exact at any moment.
+"""
+
+import asyncio
+import logging
+from typing import List, Optional, Set, Tuple
+
+from sqlalchemy import (
+    CTE,
+    Integer,
+    any_,
+    bindparam,
+    delete,
+    exists,
+    func,
+    literal,
+    select,
+    union_all,
+    update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import async_session
+from likes.models import LIKE_COUNT_SHARDS, like_count_shards, likes
+from tweets.models import Tweet
+from users.models import User
+from utils.pagination import cut_page, get_id_cursor
+
+logger = logging.getLogger(__name__)
+
+LIKE_COUNTS_FOLD_INTERVAL: float = 5.0
+LIKE_COUNTS_FOLD_BATCH: int = 10000
+LIKES_PAGE_SIZE: int = 50
+LIKES_MAX_PAGE_SIZE: int = 100
+
+
+def count_like_changes(*changes: Tuple[CTE, int]):
+    """Function of building the statement adding deltas of changed likes to shards.
+
+    Every change is a CTE of changed (tweet_id, user_id) rows with its delta.
+    Deltas are summed by shard, shards are locked in order of (tweet, shard),
+    so concurrent batches do not deadlock.
+    """
+    deltas = union_all(*(
+        select(
+            i_likes.c.tweet_id,
+            (i_likes.c.user_id % LIKE_COUNT_SHARDS).label('shard'),
+            literal(i_delta).label('delta'),
+        )
+        for i_likes, i_delta in changes
+    )).subquery('deltas')
+    stmt = insert(like_count_shards).from_select(
+        ['tweet_id', 'shard', 'delta'],
+        select(deltas.c.tweet_id, deltas.c.shard, func.sum(deltas.c.delta)).
+        group_by(deltas.c.tweet_id, deltas.c.shard).
+        order_by(deltas.c.tweet_id, deltas.c.shard),
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=['tweet_id', 'shard'],
+        set_={'delta': like_count_shards.c.delta + stmt.excluded.delta},
+    ).returning(like_count_shards.c.tweet_id).add_cte(
+        *(i_likes for i_likes, _ in changes),
+    )
+
+
+def select_like_count():
+    """Function of building the expression of likes count of the tweet of the query."""
+    pending = select(func.sum(like_count_shards.c.delta)).filter(
+        like_count_shards.c.tweet_id == Tweet.id,
+    ).scalar_subquery()
+    return Tweet.like_count + func.coalesce(pending, 0)
+
+
+async def add_like(session: AsyncSession, tweet_id: int, user_id: int) -> bool:
+    """Function of adding user's like to the existing tweet.
+
+    Returns False when nothing is added: the tweet is already liked or not exist.
+    """
+    like_query = select(literal(tweet_id), literal(user_id)).filter(
+        exists().where(Tweet.id == tweet_id),
+    )
+    added_like = insert(likes).from_select(
+        ['tweet_id', 'user_id'], like_query,
+    ).on_conflict_do_nothing().returning(likes.c.tweet_id, likes.c.user_id)
+    res = await session.execute(
+        count_like_changes((added_like.cte('added_like'), 1)),
+    )
+    is_added: bool = res.first() is not None
+
+    return is_added
+
+
+async def delete_like(session: AsyncSession, tweet_id: int, user_id: int) -> bool:
+    """Function of deleting user's like from the tweet.
+
+    Returns False when there is no such like.
+    """
+    deleted_like = delete(likes).filter(
+        likes.c.tweet_id == tweet_id,
+        likes.c.user_id == user_id,
+    ).returning(likes.c.tweet_id, likes.c.user_id)
+    res = await session.execute(
+        count_like_changes((deleted_like.cte('deleted_like'), -1)),
+    )
+    is_deleted: bool = res.first() is not None
+
+    return is_deleted
+
+
+def unnest_likes(likes_keys: List[Tuple[int, int]]):
+    """Function of building the table of (tweet_id, user_id) pairs by two arrays."""
+    tweet_ids = bindparam(None, [i_key[0] for i_key in likes_keys], type_=ARRAY(Integer))
+    user_ids = bindparam(None, [i_key[1] for i_key in likes_keys], type_=ARRAY(Integer))
+    return func.unnest(tweet_ids, user_ids).table_valued(
+        'tweet_id', 'user_id',
+    ).render_derived()
+
+
+async def write_likes(
+        session: AsyncSession,
+        added: List[Tuple[int, int]],
+        deleted: List[Tuple[int, int]],
+) -> Set[int]:
+    """Function of adding and deleting batches of (tweet_id, user_id) likes.
+
+    Both batches and deltas of their counters are written by one statement,
+    whatever their sizes. Existing likes are not added again, likes of
+    missing tweets are skipped. Returns ids of the tweets with changed likes.
+    """
+    added_rows = unnest_likes(added)
+    added_likes = insert(likes).from_select(
+        ['tweet_id', 'user_id'],
+        select(added_rows.c.tweet_id, added_rows.c.user_id).
+        join(Tweet, Tweet.id == added_rows.c.tweet_id).
+        order_by(added_rows.c.tweet_id, added_rows.c.user_id),
+    ).on_conflict_do_nothing().returning(likes.c.tweet_id, likes.c.user_id)
+    deleted_rows = unnest_likes(deleted)
+    deleted_likes = delete(likes).filter(
+        likes.c.tweet_id == deleted_rows.c.tweet_id,
+        likes.c.user_id == deleted_rows.c.user_id,
+    ).returning(likes.c.tweet_id, likes.c.user_id)
+
+    res = await session.execute(count_like_changes(
+        (added_likes.cte('added_likes'), 1), (deleted_likes.cte('deleted_likes'), -1),
+    ))
+    return set(res.scalars().all())
+
+
+async def get_liked_tweet_ids(
+        session: AsyncSession,
+        user_id: int,
+        tweet_ids: List[int],
+) -> Set[int]:
+    """Function of getting ids of the tweets of the page which are liked by the user.
+
+    The page is checked by one statement, whatever its size: the array
+    is one parameter, so the statement is prepared once for every page.
+    """
+    if not tweet_ids:
+        return set()
+
+    page_ids = bindparam('page_ids', tweet_ids, type_=ARRAY(Integer))
+    res = await session.execute(
+        select(likes.c.tweet_id).filter(
+            likes.c.tweet_id == any_(page_ids),
+            likes.c.user_id == user_id,
+        )
+    )
+    return set(res.scalars().all())
+
+
+async def get_tweet_likers(
+        session: AsyncSession,
+        tweet_id: int,
+        limit: int = LIKES_PAGE_SIZE,
+        after_id: Optional[int] = None,
+) -> Tuple[List[dict], Optional[str]]:
+    """Function of getting a page of users who liked the tweet and the next cursor.
+
+    Likers are ordered by id, so the page is a range scan of the primary
+    key of ``likes`` and costs the same on any page.
+    """
+    query = select(User.id, User.name).join(likes, likes.c.user_id == User.id).filter(
+        likes.c.tweet_id == tweet_id,
+    )
+    if after_id is not None:
+        query = query.filter(likes.c.user_id > after_id)
+    res = await session.execute(query.order_by(likes.c.user_id).limit(limit + 1))
+    rows, next_cursor = cut_page(items=res.all(), limit=limit, get_cursor=get_id_cursor)
+
+    return [{'user_id': i_row.id, 'name': i_row.name} for i_row in rows], next_cursor
+
+
+async def fold_like_counts(session: AsyncSession) -> int:
+    """Function of moving pending deltas of likes counters to ``tweets.like_count``.
+
+    Up to ``LIKE_COUNTS_FOLD_BATCH`` shards are locked in order of (tweet,
+    shard), as batches of likes lock them, so folding does not deadlock
+    with likes. Then they are deleted and summed by the same statement:
+    a like counted after the deleting takes a new shard's row and is folded
+    next time. Returns count of the folded shards.
+    """
+    locked = select(like_count_shards.c.tweet_id, like_count_shards.c.shard).order_by(
+        like_count_shards.c.tweet_id, like_count_shards.c.shard,
+    ).limit(LIKE_COUNTS_FOLD_BATCH).with_for_update().cte('locked')
+    folded = delete(like_count_shards).filter(
+        like_count_shards.c.tweet_id == locked.c.tweet_id,
+        like_count_shards.c.shard == locked.c.shard,
+    ).returning(like_count_shards.c.tweet_id, like_count_shards.c.delta).cte('folded')
+    sums = select(
+        folded.c.tweet_id, func.sum(folded.c.delta).label('delta'),
+    ).group_by(folded.c.tweet_id).subquery()
+    folded_counts = update(Tweet).filter(Tweet.id == sums.c.tweet_id).values(
+        like_count=Tweet.like_count + sums.c.delta,
+    ).returning(Tweet.id).cte('folded_counts')
+    res = await session.execute(
+        select(func.count()).select_from(folded).add_cte(locked, folded_counts),
+    )
+    return res.scalar()
+
+
+async def run_like_counts_folding(interval: float) -> None:
+    """Function of folding deltas of likes counters periodically, until cancelled."""
+    while True:
+        try:
+            folded: int = LIKE_COUNTS_FOLD_BATCH
+            while folded == LIKE_COUNTS_FOLD_BATCH:
+                async with async_session() as session, session.begin():
+                    folded = await fold_like_counts(session=session)
+        except (OSError, SQLAlchemyError) as exc:
+            logger.warning('Folding of likes counters failed, retrying: %s', exc)
+        await asyncio.sleep(interval)
@@ -1,16 +1,28 @@
 """Main module. API launch point."""
 
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import asynccontextmanager, suppress
 
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.exceptions import RequestValidationError
+from fastapi.responses import ORJSONResponse
 from sqlalchemy import select
 
 import exceptions as common_exc
-from database import async_session
+from config import settings
+from database import async_session, engine, replicas
+from dependencies import remember_writer
+from exports.router import router as router_exports
 from images import exceptions as images_exc
 from images.router import router as router_img
+from likes.queue import LIKES_FLUSH_INTERVAL, likes_queue
+from likes.service import LIKE_COUNTS_FOLD_INTERVAL, run_like_counts_folding
+from metrics.middleware import MetricsMiddleware
+from metrics.router import router as router_metrics
+from metrics.service import instrument_engine
 from tweets import exceptions as tweet_exc
+from trends.router import router as router_trends
+from trends.service import TRENDS_PRUNE_INTERVAL, run_trends_pruning
 from tweets.router import router as router_tweet
 from users import exceptions as user_exc
 from users.models import User
@@ -30,7 +42,32 @@ async def lifespan(app: FastAPI):
             user2 = User(name='Fillipe', api_key='test2')
             session.add_all([user1, user2])
             await session.commit()
-        yield
+
+    # Checking lag of read replicas in background
+    replicas_checks = asyncio.create_task(
+        replicas.run_lag_checks(interval=settings.db_replica_check_interval_seconds),
+    )
+    # Pruning counters of hashtags which are out of trends' windows
+    trends_pruning = asyncio.create_task(
+        run_trends_pruning(interval=TRENDS_PRUNE_INTERVAL),
+    )
+    # Folding deltas of likes counters to tweets
+    like_counts_folding = asyncio.create_task(
+        run_like_counts_folding(interval=LIKE_COUNTS_FOLD_INTERVAL),
+    )
+    tasks = [replicas_checks, trends_pruning, like_counts_folding]
+    # Writing queued likes by batches
+    if settings.likes_write_behind:
+        tasks.append(asyncio.create_task(
+            likes_queue.run_flushing(interval=LIKES_FLUSH_INTERVAL),
+        ))
+    yield
+    for i_task in tasks:
+        i_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await i_task
+    # Likes acknowledged to users are not lost
+    await likes_queue.flush()
 
 
 # App initialization
@@ -39,12 +76,22 @@ app_api = FastAPI(
     title='Microblogging service API',
     root_path='/api',
     lifespan=lifespan,
+    dependencies=[Depends(remember_writer)],
+    default_response_class=ORJSONResponse,
 )
 
+# Metrics of requests and SQL-statements
+app_api.add_middleware(MetricsMiddleware)
+for i_engine in (engine, *replicas.engines):
+    instrument_engine(i_engine)
+
 # Routers connecting
 app_api.include_router(router_img)
 app_api.include_router(router_tweet)
 app_api.include_router(router_user)
+app_api.include_router(router_metrics)
+app_api.include_router(router_exports)
+app_api.include_router(router_trends)
 
 # Exception hendlers connecting
 app_api.add_exception_handler(
@@ -53,6 +100,12 @@ app_api.add_exception_handler(
 app_api.add_exception_handler(
     common_exc.RelationshipError, common_exc.relationship_exception_handler,
 )
+app_api.add_exception_handler(
+    common_exc.InvalidCursorError, common_exc.invalid_cursor_exception_handler,
+)
+app_api.add_exception_handler(
+    common_exc.AccessDeniedError, common_exc.access_denied_exception_handler,
+)
 app_api.add_exception_handler(
     RequestValidationError, common_exc.validation_exception_handler,
 )
@@ -71,3 +124,6 @@ app_api.add_exception_handler(
 app_api.add_exception_handler(
     images_exc.FileMalwareError, images_exc.file_malware_exception_handler,
 )
+app_api.add_exception_handler(
+    images_exc.FilesCountError, images_exc.files_count_exception_handler,
+)
@@ -0,0 +1,69 @@
+"""Module with ASGI-middleware of HTTP-requests' metrics."""
+
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from metrics.service import (
+    REQUEST_DURATION,
+    REQUEST_SQL_DURATION,
+    REQUEST_STATEMENTS,
+    REQUESTS_IN_FLIGHT,
+    REQUESTS_TOTAL,
+    RESPONSE_SIZE,
+    check_request_sql,
+    create_request_sql_stats,
+    request_sql_stats,
+)
+
+UNMATCHED_ROUTE: str = 'unmatched'
+
+
+class MetricsMiddleware:
+    """Pure ASGI-middleware recording latency, size and SQL of requests by route.
+
+    Routes are labelled by their path templates, so the labels don't grow
+    with ids in paths.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        method: str = scope['method']
+        status: int = 500
+        size: int = 0
+
+        async def send_with_metrics(message: Message) -> None:
+            nonlocal status, size
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            elif message['type'] == 'http.response.body':
+                size += len(message.get('body', b''))
+            await send(message)
+
+        stats = create_request_sql_stats()
+        token = request_sql_stats.set(stats)
+        REQUESTS_IN_FLIGHT.inc(method)
+        started_at: float = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            duration: float = time.perf_counter() - started_at
+            REQUESTS_IN_FLIGHT.dec(method)
+            request_sql_stats.reset(token)
+
+            route = scope.get('route')
+            route_path: str = getattr(route, 'path', UNMATCHED_ROUTE)
+            REQUESTS_TOTAL.inc(method, route_path, str(status))
+            REQUEST_DURATION.observe(method, route_path, value=duration)
+            RESPONSE_SIZE.observe(method, route_path, value=size)
+            REQUEST_STATEMENTS.observe(method, route_path, value=stats.statements)
+            REQUEST_SQL_DURATION.observe(method, route_path, value=stats.duration)
+
+        if route is not None:
+            check_request_sql(stats=stats, method=method, route=route)
@@ -0,0 +1,27 @@
+"""Module with endpoint of the app's metrics.
+
+Scrapes are authorized by the bearer token ``settings.metrics_token``.
+Without the token metrics are served to anyone: the endpoint must be
+reachable by the scraper only, nginx denies it to clients.
+"""
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from database import engine
+from dependencies import check_metrics_token
+from metrics.service import update_pool_gauges
+from utils.metrics import registry
+
+PROMETHEUS_CONTENT_TYPE: str = 'text/plain; version=0.0.4; charset=utf-8'
+
+router = APIRouter(tags=['Metrics'])
+
+
+@router.get(
+    '/metrics', include_in_schema=False, dependencies=[Depends(check_metrics_token)],
+)
+async def get_metrics():
+    """Endpoint of GET-request of metrics in Prometheus text format."""
+    update_pool_gauges(engine=engine)
+    return PlainTextResponse(registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
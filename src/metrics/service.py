@@ -0,0 +1,157 @@
+"""Module with metrics of requests, SQL-statements and DB pool.
+
+SQL-statements are counted by engine events into the stats of the current
+request, which the metrics middleware keeps in a context variable. The
+count is checked against the query budget declared by the endpoint, and
+statements repeated by the request (likely N+1 queries) may be logged.
+"""
+
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import QueuePool
+from starlette.routing import BaseRoute
+
+from config import settings
+from utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+SIZE_BUCKETS: tuple = (100, 1000, 10000, 100000, 1000000, 10000000)
+STATEMENTS_BUCKETS: tuple = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+REQUESTS_TOTAL = registry.counter(
+    'http_requests_total', 'Count of finished HTTP-requests.',
+    ('method', 'route', 'status'),
+)
+REQUEST_DURATION = registry.histogram(
+    'http_request_duration_seconds', 'Latency of HTTP-requests.', ('method', 'route'),
+)
+REQUESTS_IN_FLIGHT = registry.gauge(
+    'http_requests_in_flight', 'Count of HTTP-requests being served.', ('method',),
+)
+RESPONSE_SIZE = registry.histogram(
+    'http_response_size_bytes', 'Size of HTTP-responses bodies.', ('method', 'route'),
+    buckets=SIZE_BUCKETS,
+)
+REQUEST_STATEMENTS = registry.histogram(
+    'db_statements_per_request', 'Count of SQL-statements per HTTP-request.',
+    ('method', 'route'), buckets=STATEMENTS_BUCKETS,
+)
+REQUEST_SQL_DURATION = registry.histogram(
+    'db_sql_duration_per_request_seconds', 'Time of SQL-statements per HTTP-request.',
+    ('method', 'route'),
+)
+POOL_CONNECTIONS = registry.gauge(
+    'db_pool_connections', 'Connections of the primary pool by state.', ('state',),
+)
+
+
+class QueryBudgetExceededError(Exception):
+    """Exception when the request executes more SQL-statements than its budget."""
+
+    pass
+
+
+class RequestSqlStats:
+    """Count and time of SQL-statements executed while serving the request.
+
+    Texts of statements are counted only when ``shapes`` is passed: the same
+    text with different parameters is the same shape.
+    """
+
+    __slots__ = ('statements', 'duration', 'shapes')
+
+    def __init__(self, shapes: Optional[Counter] = None) -> None:
+        self.statements: int = 0
+        self.duration: float = 0.0
+        self.shapes: Optional[Counter] = shapes
+
+
+request_sql_stats: ContextVar[Optional[RequestSqlStats]] = ContextVar(
+    'request_sql_stats', default=None,
+)
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """Function of remembering the statement's start on the connection."""
+    conn.info['statement_started_at'] = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """Function of adding the statement to stats of the current request."""
+    stats: Optional[RequestSqlStats] = request_sql_stats.get()
+    started_at: Optional[float] = conn.info.pop('statement_started_at', None)
+    if stats is None or started_at is None:
+        return
+    stats.statements += 1
+    stats.duration += time.perf_counter() - started_at
+    if stats.shapes is not None:
+        stats.shapes[statement] += 1
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Function of counting SQL-statements of the engine. Idempotent."""
+    sync_engine = engine.sync_engine
+    if not event.contains(sync_engine, 'after_cursor_execute', after_cursor_execute):
+        event.listen(sync_engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(sync_engine, 'after_cursor_execute', after_cursor_execute)
+
+
+def update_pool_gauges(engine: AsyncEngine) -> None:
+    """Function of reading connections' counts of the engine's pool."""
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return
+    POOL_CONNECTIONS.set('checked_out', value=pool.checkedout())
+    POOL_CONNECTIONS.set('idle', value=pool.checkedin())
+    POOL_CONNECTIONS.set('overflow', value=max(pool.overflow(), 0))
+    POOL_CONNECTIONS.set('size', value=pool.size())
+
+
+def query_budget(max_statements: int) -> Callable:
+    """Decorator of declaring max count of SQL-statements of the endpoint."""
+    def decorator(endpoint: Callable) -> Callable:
+        endpoint.query_budget = max_statements
+        return endpoint
+
+    return decorator
+
+
+def create_request_sql_stats() -> RequestSqlStats:
+    """Function of creating stats of the request by settings."""
+    if settings.db_log_repeated_statements:
+        return RequestSqlStats(shapes=Counter())
+    return RequestSqlStats()
+
+
+def check_request_sql(stats: RequestSqlStats, method: str, route: BaseRoute) -> None:
+    """Function of checking SQL-statements of the served request.
+
+    Raises QueryBudgetExceededError when budgets are enforced.
+    """
+    route_name: str = f'{method} {route.path}'
+    if stats.shapes:
+        for i_statement, i_count in stats.shapes.items():
+            if i_count > 1:
+                logger.warning(
+                    '%s executed the statement %d times: %s',
+                    route_name, i_count, i_statement,
+                )
+
+    endpoint: Optional[Callable] = getattr(route, 'endpoint', None)
+    budget: Optional[int] = getattr(endpoint, 'query_budget', None)
+    if budget is None or stats.statements <= budget:
+        return
+
+    message: str = (
+        f'{route_name} executed {stats.statements} SQL-statements, budget is {budget}'
+    )
+    if settings.db_enforce_query_budgets:
+        raise QueryBudgetExceededError(message)
+    logger.warning(message)
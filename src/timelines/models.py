@@ -0,0 +1,23 @@
+"""Module with DB timelines' models."""
+
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, Table
+
+from database import Base
+
+# Table with materialized home timelines: one row per (reader, tweet) pair.
+# Primary key order makes the feed of a reader a single index range scan.
+timelines = Table(
+    'timelines',
+    Base.metadata,
+    Column('user_id', Integer, ForeignKey('users.id'), primary_key=True),
+    Column('timestamp', DateTime, primary_key=True),
+    Column(
+        'tweet_id',
+        Integer,
+        ForeignKey('tweets.id', ondelete='CASCADE'),
+        primary_key=True,
+    ),
+    Column('author_id', Integer, ForeignKey('users.id'), nullable=False),
+    Index('ix_timelines_tweet_id', 'tweet_id'),
+    Index('ix_timelines_user_id_author_id', 'user_id', 'author_id'),
+)
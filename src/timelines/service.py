@@ -0,0 +1,89 @@
+"""Module with DB-operations with home timelines.
+
+Tweets are copied to followers' timelines on write (fan-out-on-write).
+Authors with more than ``FANOUT_FOLLOWERS_LIMIT`` followers are skipped:
+their tweets are marked as not fanned out and merged into the feed at read
+time instead. The mark stays when the author's followers count crosses the
+limit, so tweets are neither lost from the feeds nor duplicated.
+"""
+
+from sqlalchemy import delete, literal, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from timelines.models import timelines
+from tweets.models import Tweet
+from users.models import User, followers
+
+FANOUT_FOLLOWERS_LIMIT: int = 10000
+TIMELINE_BACKFILL_SIZE: int = 200
+
+
+def is_fanout_author(user_id: int):
+    """Function of building SQL-condition of author's tweets fanning out."""
+    followers_count = select(User.followers_count).filter(User.id == user_id)
+    return followers_count.scalar_subquery() <= FANOUT_FOLLOWERS_LIMIT
+
+
+async def fan_out_tweet(session: AsyncSession, tweet: Tweet) -> None:
+    """Function of adding the new tweet to timelines of author's followers.
+
+    The tweet of a popular author is marked as not fanned out by the same
+    statement, so the mark and the timelines agree whatever the count is.
+    """
+    followers_query = select(
+        followers.c.follower_id,
+        literal(tweet.timestamp),
+        literal(tweet.id),
+        literal(tweet.user_id),
+    ).filter(
+        followers.c.followed_id == tweet.user_id,
+        is_fanout_author(user_id=tweet.user_id),
+    )
+    fanned_out = insert(timelines).from_select(
+        ['user_id', 'timestamp', 'tweet_id', 'author_id'], followers_query,
+    ).on_conflict_do_nothing().cte('fanned_out')
+    await session.execute(
+        update(Tweet).filter(
+            Tweet.id == tweet.id,
+            ~is_fanout_author(user_id=tweet.user_id),
+        ).values(is_fanned_out=False).add_cte(fanned_out).
+        execution_options(synchronize_session=False)
+    )
+
+
+async def backfill_timeline(
+        session: AsyncSession,
+        user_id: int,
+        followed_id: int,
+) -> None:
+    """Function of adding recent tweets of the followed user to user's timeline.
+
+    Tweets not fanned out are skipped, they are merged into the feed at read time.
+    """
+    tweets_query = select(
+        literal(user_id),
+        Tweet.timestamp,
+        Tweet.id,
+        Tweet.user_id,
+    ).filter(
+        Tweet.user_id == followed_id,
+        Tweet.is_fanned_out,
+    ).order_by(
+        Tweet.timestamp.desc(), Tweet.id.desc(),
+    ).limit(TIMELINE_BACKFILL_SIZE)
+    await session.execute(
+        insert(timelines).
+        from_select(['user_id', 'timestamp', 'tweet_id', 'author_id'], tweets_query).
+        on_conflict_do_nothing()
+    )
+
+
+async def prune_timeline(session: AsyncSession, user_id: int, followed_id: int) -> None:
+    """Function of deleting tweets of the unfollowed user from user's timeline."""
+    await session.execute(
+        delete(timelines).filter(
+            timelines.c.user_id == user_id,
+            timelines.c.author_id == followed_id,
+        )
+    )
@@ -0,0 +1,33 @@
+"""Module with DB hashtags' models."""
+
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, Table
+
+from database import Base
+
+HASHTAG_MAX_LENGTH: int = 64
+
+# Index table of hashtags of tweets, the timestamp is the tweet's one
+tweet_hashtags = Table(
+    'tweet_hashtags',
+    Base.metadata,
+    Column(
+        'tweet_id',
+        Integer,
+        ForeignKey('tweets.id', ondelete='CASCADE'),
+        primary_key=True,
+    ),
+    Column('tag', String(HASHTAG_MAX_LENGTH), primary_key=True),
+    Column('timestamp', DateTime, nullable=False),
+    Index('ix_tweet_hashtags_tag_timestamp', 'tag', 'timestamp'),
+)
+
+# Counts of tweets by hashtag in time buckets of ``resolution`` seconds.
+# Primary key order makes a window of one resolution a single index range scan.
+hashtag_counts = Table(
+    'hashtag_counts',
+    Base.metadata,
+    Column('resolution', Integer, primary_key=True),
+    Column('bucket', DateTime, primary_key=True),
+    Column('tag', String(HASHTAG_MAX_LENGTH), primary_key=True),
+    Column('count', Integer, nullable=False),
+)
@@ -0,0 +1,50 @@
+"""Module with endpoints of trends of hashtags."""
+
+from typing import Union
+
+from fastapi import APIRouter, Depends, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from dependencies import (
+    get_read_session,
+    get_user_by_api_key_dependencie,
+    transaction_mode,
+)
+from metrics.service import query_budget
+from trends.service import (
+    TRENDS_CACHE_TTL,
+    TRENDS_LIMIT,
+    TRENDS_MAX_LIMIT,
+    TrendWindow,
+    get_trends_page,
+)
+from users.schemas import UserPrincipal
+from utils.global_schemas import ResponseError, ResponseTrendsGet
+
+router = APIRouter(prefix='/trends', tags=['Trends'])
+
+
+@router.get(
+        '',
+        response_model=Union[ResponseTrendsGet, ResponseError],
+)
+@query_budget(2)
+@transaction_mode('autocommit')
+async def get_trends(
+    window: TrendWindow = '1h',
+    limit: int = Query(TRENDS_LIMIT, ge=1, le=TRENDS_MAX_LIMIT),
+    session: AsyncSession = Depends(get_read_session),
+    user: UserPrincipal = Depends(get_user_by_api_key_dependencie),
+):
+    """Endpoint of GET-request of the most used hashtags of the window.
+
+    Trends are the same for every user: they are computed once in a few
+    seconds and may be cached by clients as long.
+    """
+    page: bytes = await get_trends_page(session=session, window=window, limit=limit)
+
+    return Response(
+        content=page,
+        media_type='application/json',
+        headers={'Cache-Control': f'max-age={int(TRENDS_CACHE_TTL)}'},
+    )
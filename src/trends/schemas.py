@@ -0,0 +1,10 @@
+"""Module with trends' validation schemes."""
+
+from pydantic import BaseModel
+
+
+class TrendOut(BaseModel):
+    """GET-request output scheme of a trending hashtag."""
+
+    tag: str
+    count: int
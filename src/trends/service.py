@@ -0,0 +1,224 @@
+"""Module with hashtags of tweets and their trends.
+
+Hashtags are extracted from text of the tweet when it is created. Every
+hashtag increments its counters of the tweet's time bucket, one counter
+per resolution of ``TREND_WINDOWS``, deleting the tweet decrements the
+same counters. Trends of a window sum counters of the window's buckets:
+their cost depends on count of hashtags in the window, not of tweets.
+Counters older than their windows are pruned periodically.
+"""
+
+import asyncio
+import logging
+import re
+from datetime import datetime, timedelta
+from typing import Dict, List, Literal, Tuple
+
+import orjson
+from sqlalchemy import (
+    CTE,
+    Integer,
+    Interval,
+    Select,
+    and_,
+    column,
+    delete,
+    func,
+    literal,
+    literal_column,
+    or_,
+    select,
+    true,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import async_session
+from trends.models import HASHTAG_MAX_LENGTH, hashtag_counts, tweet_hashtags
+from utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+HASHTAG_PATTERN = re.compile(r'(?<!\w)#(\w+)')
+HASHTAGS_PER_TWEET: int = 10
+TrendWindow = Literal['1h', '24h']
+# Windows of trends: (length, resolution of counters' buckets)
+TREND_WINDOWS: Dict[str, Tuple[timedelta, timedelta]] = {
+    '1h': (timedelta(hours=1), timedelta(minutes=1)),
+    '24h': (timedelta(hours=24), timedelta(hours=1)),
+}
+BUCKETS_ORIGIN: datetime = datetime(2000, 1, 1)
+TRENDS_LIMIT: int = 10
+TRENDS_MAX_LIMIT: int = 50
+TRENDS_CACHE_TTL: float = 5.0
+TRENDS_PRUNE_INTERVAL: float = 600.0
+
+# Encoded responses by (window, limit): trends are the same for every reader
+trends_cache: TTLCache[bytes] = TTLCache(
+    maxsize=len(TREND_WINDOWS) * TRENDS_MAX_LIMIT, ttl=TRENDS_CACHE_TTL,
+)
+
+
+def extract_hashtags(text: str) -> List[str]:
+    """Function of getting unique lowercase hashtags of the text in order of use.
+
+    Too long hashtags are skipped, only the first ``HASHTAGS_PER_TWEET``
+    are kept.
+    """
+    tags: Dict[str, None] = {}
+    for i_match in HASHTAG_PATTERN.finditer(text):
+        tag: str = i_match.group(1).lower()
+        if len(tag) <= HASHTAG_MAX_LENGTH:
+            tags[tag] = None
+            if len(tags) == HASHTAGS_PER_TWEET:
+                break
+    return list(tags)
+
+
+def get_resolutions() -> Select:
+    """Function of getting VALUES of resolutions of counters in seconds."""
+    return values(column('resolution', Integer), name='resolutions').data([
+        (int(i_resolution.total_seconds()),) for _, i_resolution in TREND_WINDOWS.values()
+    ])
+
+
+def get_bucket(resolution, timestamp):
+    """Function of building expression of start of the timestamp's bucket."""
+    second = literal_column("interval '1 second'", Interval)
+    return func.date_bin(second * resolution, timestamp, literal(BUCKETS_ORIGIN))
+
+
+async def add_tweet_hashtags(
+        session: AsyncSession,
+        tweet_id: int,
+        timestamp: datetime,
+        tags: List[str],
+) -> None:
+    """Function of adding hashtags of the tweet and incrementing their counters.
+
+    Counters are locked in order of (resolution, tag): tweets with the same
+    hashtags in other order do not deadlock.
+    """
+    if not tags:
+        return
+
+    added_hashtags = insert(tweet_hashtags).values([
+        {'tweet_id': tweet_id, 'tag': i_tag, 'timestamp': timestamp} for i_tag in tags
+    ]).returning(tweet_hashtags.c.tag, tweet_hashtags.c.timestamp).cte('added_hashtags')
+    resolutions = get_resolutions()
+    counters = select(
+        resolutions.c.resolution,
+        get_bucket(resolutions.c.resolution, added_hashtags.c.timestamp),
+        added_hashtags.c.tag,
+        literal(1),
+    ).select_from(added_hashtags).join(resolutions, true()).order_by(
+        resolutions.c.resolution, added_hashtags.c.tag,
+    )
+    stmt = insert(hashtag_counts).from_select(
+        ['resolution', 'bucket', 'tag', 'count'], counters,
+    )
+    await session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=['resolution', 'bucket', 'tag'],
+            set_={'count': hashtag_counts.c.count + stmt.excluded.count},
+        ).add_cte(added_hashtags)
+    )
+
+
+def release_tweet_hashtags(deleted_tweet_ids: Select) -> CTE:
+    """Function of building CTE decrementing counters of hashtags of deleted tweets.
+
+    Rows of ``tweet_hashtags`` are deleted by the FK-cascade, the CTE reads
+    them before the deleting statement. Counters are locked in order of
+    (resolution, bucket, tag) before the update, as tweets adding hashtags
+    lock them, so concurrent adding and deleting do not deadlock.
+    """
+    resolutions = get_resolutions()
+    released_counters = select(
+        resolutions.c.resolution,
+        get_bucket(resolutions.c.resolution, tweet_hashtags.c.timestamp).label('bucket'),
+        tweet_hashtags.c.tag,
+    ).join(resolutions, true()).filter(
+        tweet_hashtags.c.tweet_id.in_(deleted_tweet_ids),
+    ).subquery()
+    locked_counters = select(
+        hashtag_counts.c.resolution, hashtag_counts.c.bucket, hashtag_counts.c.tag,
+    ).join(released_counters, and_(
+        hashtag_counts.c.resolution == released_counters.c.resolution,
+        hashtag_counts.c.bucket == released_counters.c.bucket,
+        hashtag_counts.c.tag == released_counters.c.tag,
+    )).order_by(
+        hashtag_counts.c.resolution, hashtag_counts.c.bucket, hashtag_counts.c.tag,
+    ).with_for_update(of=hashtag_counts).cte('locked_counters')
+
+    return update(hashtag_counts).filter(
+        hashtag_counts.c.resolution == locked_counters.c.resolution,
+        hashtag_counts.c.bucket == locked_counters.c.bucket,
+        hashtag_counts.c.tag == locked_counters.c.tag,
+    ).values(
+        count=hashtag_counts.c.count - 1,
+    ).returning(hashtag_counts.c.tag).cte('released_hashtags')
+
+
+async def get_trends(
+        session: AsyncSession,
+        window: TrendWindow,
+        limit: int,
+) -> List[dict]:
+    """Function of getting the most used hashtags of the window with their counts.
+
+    The window slides by buckets: its start is precise to the resolution.
+    """
+    length, resolution = TREND_WINDOWS[window]
+    total = func.sum(hashtag_counts.c.count)
+    res = await session.execute(
+        select(hashtag_counts.c.tag, total.label('count')).filter(
+            hashtag_counts.c.resolution == int(resolution.total_seconds()),
+            hashtag_counts.c.bucket >= datetime.now() - length,
+        ).group_by(hashtag_counts.c.tag).having(total > 0).
+        order_by(total.desc(), hashtag_counts.c.tag).limit(limit)
+    )
+    return [{'tag': i_row.tag, 'count': i_row.count} for i_row in res]
+
+
+async def get_trends_page(
+        session: AsyncSession,
+        window: TrendWindow,
+        limit: int,
+) -> bytes:
+    """Function of getting the encoded response of trends, cached for a few seconds."""
+    key: Tuple[str, int] = (window, limit)
+    body = trends_cache.get(key)
+    if body is None:
+        trends: List[dict] = await get_trends(session=session, window=window, limit=limit)
+        body = orjson.dumps({'result': True, 'window': window, 'trends': trends})
+        trends_cache.set(key, body)
+    return body
+
+
+async def prune_hashtag_counts(session: AsyncSession) -> None:
+    """Function of deleting counters of buckets which are out of their windows."""
+    now: datetime = datetime.now()
+    await session.execute(
+        delete(hashtag_counts).filter(or_(*(
+            and_(
+                hashtag_counts.c.resolution == int(i_resolution.total_seconds()),
+                hashtag_counts.c.bucket < now - i_length - i_resolution,
+            )
+            for i_length, i_resolution in TREND_WINDOWS.values()
+        )))
+    )
+
+
+async def run_trends_pruning(interval: float) -> None:
+    """Function of pruning counters of hashtags periodically, until cancelled."""
+    while True:
+        try:
+            async with async_session() as session, session.begin():
+                await prune_hashtag_counts(session=session)
+        except (OSError, SQLAlchemyError) as exc:
+            logger.warning('Pruning of hashtags counters failed, retrying: %s', exc)
+        await asyncio.sleep(interval)
@@ -2,34 +2,108 @@
 
 from typing import Dict, List, Optional
 
-from sqlalchemy import Column, String, Integer, ForeignKey, DateTime
-from sqlalchemy import select
+from datetime import datetime
+
+from sqlalchemy import Boolean, Column, Computed, String, Integer, ForeignKey, DateTime
+from sqlalchemy import Index
+from sqlalchemy import and_, func, select
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import deferred, query_expression, relationship
 
+from config import settings
 from database import Base
 from likes.models import likes
 
+# Count of likers previewed by entries of the feeds
+LIKES_PREVIEW_SIZE: int = settings.feed_likes_preview_size
+
+# Text search configuration of tweets: words are not stemmed, any language fits
+TWEETS_SEARCH_CONFIG: str = 'simple'
+
+# Likes of the previews of the feeds' entries
+preview_likes = likes.alias('preview_likes')
+
 
 class Tweet(Base):
     """DB tweet's model."""
 
     __tablename__ = 'tweets'
-    __table_args__ = {'extend_existing': True}
 
     id = Column(Integer, primary_key=True)
     content = Column(String, nullable=False)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
-    timestamp = Column(DateTime)
+    timestamp = Column(DateTime, nullable=False, default=datetime.now)
+    # Likes folded from ``like_count_shards``, the count is their sum with the shards
+    like_count = Column(Integer, nullable=False, default=0, server_default='0')
+    # False when the tweet is not copied to timelines, read feeds merge it instead
+    is_fanned_out = Column(Boolean, nullable=False, default=True, server_default='true')
+    # Lexemes of the content for full-text search, kept by Postgres
+    content_tsv = deferred(Column(
+        TSVECTOR,
+        Computed(f"to_tsvector('{TWEETS_SEARCH_CONFIG}', content)", persisted=True),
+    ))
+
+    # Indexes of keyset pagination of the feeds: (timestamp, id) DESC
+    __table_args__ = (
+        Index('ix_tweets_timestamp_id', timestamp.desc(), id.desc()),
+        Index('ix_tweets_user_id_timestamp_id', user_id, timestamp.desc(), id.desc()),
+        Index(
+            'ix_tweets_not_fanned_out_user_id_timestamp_id',
+            user_id, timestamp.desc(), id.desc(),
+            postgresql_where=is_fanned_out.is_(False),
+        ),
+        Index('ix_tweets_content_tsv', content_tsv, postgresql_using='gin'),
+        {'extend_existing': True},
+    )
+    # The generated lexemes are not fetched back by inserts
+    __mapper_args__ = {'eager_defaults': False}
 
     user = relationship('User', back_populates='tweets')
-    liked_users = relationship('User', secondary=likes, back_populates='liked_tweets')
+    liked_users = relationship(
+        'User',
+        secondary=likes,
+        back_populates='liked_tweets',
+        passive_deletes=True,
+    )
+    # First likers of the feed entry, the rest of them are not loaded
+    likes_preview = relationship(
+        'User',
+        secondary=likes,
+        primaryjoin=lambda: and_(
+            likes.c.tweet_id == Tweet.id,
+            likes.c.user_id <= Tweet.last_preview_liker(),
+        ),
+        secondaryjoin='User.id == likes.c.user_id',
+        order_by='User.id',
+        viewonly=True,
+    )
+    # Likes count of the feed entry, loaded by ``with_expression``
+    total_likes = query_expression()
     attachments = relationship(
         'Media',
         back_populates='tweet',
         cascade='all, delete-orphan',
+        passive_deletes=True,
     )
 
+    @classmethod
+    def last_preview_liker(cls):
+        """Function of building the expression of id of the last liker of the preview.
+
+        Likers of the preview are read from the primary key of ``likes``,
+        so a page of viral tweets costs the same as a page of any tweets.
+        """
+        likers = select(preview_likes.c.user_id).filter(
+            preview_likes.c.tweet_id == cls.id,
+        ).order_by(preview_likes.c.user_id)
+        return func.coalesce(
+            likers.offset(LIKES_PREVIEW_SIZE - 1).limit(1).scalar_subquery(),
+            select(func.max(preview_likes.c.user_id)).filter(
+                preview_likes.c.tweet_id == cls.id,
+            ).scalar_subquery(),
+        )
+
     def to_json(self) -> Dict[str, str]:
         """Function of convertation objs to JSON."""
         attachments: List[str] = [''.join(['/static/images/', i_attach.name])
@@ -37,8 +111,7 @@ class Tweet(Base):
                                   ]
         author: Dict[str, str] = {'id': self.user.id, 'name': self.user.name}
         likes: Optional[List[dict]] = [
-            {'user_id': i_user.id, 'name': i_user.name}
-            for i_user in self.liked_users
+            {'user_id': i_user.id, 'name': i_user.name} for i_user in self.likes_preview
         ]
 
         return {
@@ -46,6 +119,7 @@ class Tweet(Base):
             'content': self.content,
             'attachments': attachments,
             'author': author,
+            'like_count': self.total_likes,
             'likes': likes,
         }
 
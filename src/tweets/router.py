@@ -1,19 +1,51 @@
 """Module with endpoints of actions with tweets."""
 
-from typing import List, Optional, Union
+from functools import partial
+from typing import Optional, Union
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Response
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from dependencies import get_user_by_api_key_dependencie, get_session
+from config import settings
+from database import after_commit
+from dependencies import (
+    get_read_session,
+    get_session,
+    get_user_by_api_key_dependencie,
+    is_recent_writer,
+    transaction_mode,
+)
 from exceptions import RelationshipError
 from images.service import update_medias
+from likes.queue import likes_queue
+from likes.service import (
+    LIKES_MAX_PAGE_SIZE,
+    LIKES_PAGE_SIZE,
+    add_like,
+    delete_like,
+    get_liked_tweet_ids,
+    get_tweet_likers,
+)
+from metrics.service import query_budget
+from timelines.service import fan_out_tweet
+from trends.service import add_tweet_hashtags, extract_hashtags
 from tweets.exceptions import NonUserTweetError, TweetNotFoundError
-from tweets.models import Tweet
 from tweets.schemas import TweetIn
-from tweets.service import add_tweet_to_db, get_tweet_by_id, get_all_tweets
-from users.models import User
+from tweets.service import (
+    FEED_MAX_PAGE_SIZE,
+    FEED_PAGE_SIZE,
+    SEARCH_QUERY_MAX_LENGTH,
+    add_tweet_to_db,
+    delete_user_tweet,
+    get_all_tweets_json,
+    is_tweet_exist,
+    search_tweets_json,
+)
+from tweets.snapshot import FeedPage, feed_snapshot
+from users.schemas import UserPrincipal
 from utils import global_schemas as sch
+from utils.pagination import decode_cursor, decode_id_cursor, decode_rank_cursor
 
 router = APIRouter(prefix='/tweets', tags=['Tweets'])
 
@@ -22,10 +54,11 @@ router = APIRouter(prefix='/tweets', tags=['Tweets'])
         '',
         response_model=Union[sch.ResponseTweetPost, sch.ResponseError],
 )
+@query_budget(5)
 async def create_tweet(
     tweet: TweetIn,
     session: AsyncSession = Depends(get_session),
-    user: User = Depends(get_user_by_api_key_dependencie),
+    user: UserPrincipal = Depends(get_user_by_api_key_dependencie),
 ):
     """Endpoint of POST-request of new tweet creating."""
     # Adding tweet to DB
@@ -35,6 +68,9 @@ async def create_tweet(
         user_id=user.id,
     )
 
+    # Adding tweet to followers' timelines
+    await fan_out_tweet(session=session, tweet=tweet_obj)
+
     # Updating tweet_id parameter of medias
     if tweet.tweet_media_ids:
         await update_medias(
@@ -43,31 +79,68 @@ async def create_tweet(
             new_tweet_id=tweet_obj.id,
         )
 
+    # Counting hashtags last: counters of popular ones are locked until the commit
+    await add_tweet_hashtags(
+        session=session,
+        tweet_id=tweet_obj.id,
+        timestamp=tweet_obj.timestamp,
+        tags=extract_hashtags(tweet.tweet_data),
+    )
+    # Readers building pages before the commit would store them without the tweet
+    after_commit(session, feed_snapshot.on_tweet_created)
+
     return {'result': True, 'tweet_id': tweet_obj.id}
 
 
+@router.get(
+        '/search',
+        response_model=Union[sch.ResponseTweetsGet, sch.ResponseError],
+)
+@query_budget(3)
+@transaction_mode('autocommit')
+async def search_tweets(
+    q: str = Query(..., min_length=1, max_length=SEARCH_QUERY_MAX_LENGTH),
+    limit: int = Query(FEED_PAGE_SIZE, ge=1, le=FEED_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    session: AsyncSession = Depends(get_read_session),
+    user: UserPrincipal = Depends(get_user_by_api_key_dependencie),
+):
+    """Endpoint of GET-request of searching tweets by words of their content.
+
+    Tweets are ordered by relevance, entries are the same as the feed's.
+    Pass ``next_cursor`` of the response as ``cursor`` to get the next page.
+    """
+    page_cursor = decode_rank_cursor(cursor) if cursor else None
+    await likes_queue.sync_user(user_id=user.id)
+    tweets_json, next_cursor = await search_tweets_json(
+        session=session, text=q, limit=limit, cursor=page_cursor,
+    )
+    page = FeedPage(tweets_json=tweets_json, next_cursor=next_cursor)
+    liked_ids = await get_liked_tweet_ids(
+        session=session, user_id=user.id, tweet_ids=page.page_ids,
+    )
+
+    return Response(content=page.encode(liked_ids), media_type='application/json')
+
+
 @router.delete(
         '/{id}',
         response_model=Union[sch.BaseResponse, sch.ResponseError],
 )
+@query_budget(3)
 async def delete_tweet(
     id: int,
     session: AsyncSession = Depends(get_session),
-    user: User = Depends(get_user_by_api_key_dependencie),
+    user: UserPrincipal = Depends(get_user_by_api_key_dependencie),
 ):
     """Endpoint of DELETE-request of deleting user's tweet."""
-    tweet: Optional[Tweet] = await get_tweet_by_id(session=session, tweet_id=id)
+    if await delete_user_tweet(session=session, tweet_id=id, user_id=user.id):
+        after_commit(session, partial(feed_snapshot.on_tweet_changed, tweet_id=id))
+        return {'result': True}
 
-    if not tweet:
+    if not await is_tweet_exist(session=session, tweet_id=id):
         raise TweetNotFoundError(message='Tweet with the passed id is not exist')
 
-    user_tweet_ids = [i_tweet.id for i_tweet in user.tweets]
-
-    if tweet.id in user_tweet_ids:
-        await session.delete(tweet)
-        await session.commit()
-        return {'result': True}
-
     raise NonUserTweetError(message='Deleting a tweet that does not belong to the user')
 
 
@@ -75,64 +148,133 @@ async def delete_tweet(
         '/{id}/likes',
         response_model=Union[sch.BaseResponse, sch.ResponseError],
 )
+@query_budget(3)
 async def like_tweet(
     id: int,
     session: AsyncSession = Depends(get_session),
-    user: User = Depends(get_user_by_api_key_dependencie),
+    user: UserPrincipal = Depends(get_user_by_api_key_dependencie),
 ):
-    """Endpoint of POST-request of like some tweet."""
-    tweet: Optional[Tweet] = await get_tweet_by_id(session=session, tweet_id=id)
-    if not tweet:
-        raise TweetNotFoundError(message='Tweet with the passed id is not exist')
+    """Endpoint of POST-request of like some tweet.
 
-    liked_tweets_ids = [i_tweet.id for i_tweet in user.liked_tweets]
+    In write-behind mode the like is queued and acknowledged at once:
+    repeated likes and likes of missing tweets are skipped silently.
+    """
+    if settings.likes_write_behind:
+        likes_queue.put(tweet_id=id, user_id=user.id, is_liked=True)
+        return {'result': True}
 
-    if id not in liked_tweets_ids:
-        user.liked_tweets.append(tweet)
-        await session.commit()
+    if await add_like(session=session, tweet_id=id, user_id=user.id):
+        after_commit(session, partial(feed_snapshot.on_tweet_changed, tweet_id=id))
         return {'result': True}
-    else:
-        raise RelationshipError(message='The user has already liked this tweet')
+
+    if not await is_tweet_exist(session=session, tweet_id=id):
+        raise TweetNotFoundError(message='Tweet with the passed id is not exist')
+
+    raise RelationshipError(message='The user has already liked this tweet')
 
 
 @router.delete(
         '/{id}/likes',
         response_model=Union[sch.BaseResponse, sch.ResponseError],
 )
+@query_budget(3)
 async def dislike_tweet(
     id: int,
     session: AsyncSession = Depends(get_session),
-    user: User = Depends(get_user_by_api_key_dependencie),
+    user: UserPrincipal = Depends(get_user_by_api_key_dependencie),
 ):
-    """Endpoint of DELETE-request of delete user's like."""
-    tweet: Optional[Tweet] = await get_tweet_by_id(session=session, tweet_id=id)
-    if not tweet:
-        raise TweetNotFoundError(message='Tweet with the passed id is not exist')
+    """Endpoint of DELETE-request of delete user's like.
 
-    liked_tweets_ids = [i_tweet.id for i_tweet in user.liked_tweets]
+    In write-behind mode the unlike is queued and acknowledged at once.
+    """
+    if settings.likes_write_behind:
+        likes_queue.put(tweet_id=id, user_id=user.id, is_liked=False)
+        return {'result': True}
 
-    if id in liked_tweets_ids:
-        user.liked_tweets = [i_tweet for i_tweet in user.liked_tweets if i_tweet.id != id]
-        await session.commit()
+    if await delete_like(session=session, tweet_id=id, user_id=user.id):
+        after_commit(session, partial(feed_snapshot.on_tweet_changed, tweet_id=id))
         return {'result': True}
-    else:
-        raise RelationshipError(message='There is no like on the tweet')
+
+    if not await is_tweet_exist(session=session, tweet_id=id):
+        raise TweetNotFoundError(message='Tweet with the passed id is not exist')
+
+    raise RelationshipError(message='There is no like on the tweet')
 
 
 @router.get(
         '',
         response_model=Union[sch.ResponseTweetsGet, sch.ResponseError],
 )
+@query_budget(3)
+@transaction_mode('autocommit')
 async def get_tweets(
-    session: AsyncSession = Depends(get_session),
-    user: User = Depends(get_user_by_api_key_dependencie),
+    limit: int = Query(FEED_PAGE_SIZE, ge=1, le=FEED_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    session: AsyncSession = Depends(get_read_session),
+    user: UserPrincipal = Depends(get_user_by_api_key_dependencie),
+    recent_writer: bool = Depends(is_recent_writer),
 ):
-    """Endpoint of GET-request of recieving tweets' info."""
+    """Endpoint of GET-request of recieving a page of tweets' info.
+
+    Pass ``next_cursor`` of the response as ``cursor`` to get the next page.
+    Pages are served from the feed's snapshot, users who have written
+    recently read the primary to see their writes. Flags ``liked_by_me``
+    of the page are read by one statement. Responses are encoded as they
+    are, not validated by the response model.
+    """
+    page_cursor = decode_cursor(cursor) if cursor else None
+    await likes_queue.sync_user(user_id=user.id)
+
     # You should use this part of code instead bellow code to recieve only those tweets,
     # whose users follow
-    # tweets: List[Optional[Tweet]] = await get_tweets_by_following_user(session=session,
-    #                                                                    user_id=user.id)
-    tweets: List[Optional[Tweet]] = await get_all_tweets(session=session)
+    # tweets, next_cursor = await get_tweets_by_following_user(
+    #     session=session, user_id=user.id, limit=limit, cursor=page_cursor,
+    # )
+    # page = FeedPage(
+    #     tweets_json=[i_tweet.to_json() for i_tweet in tweets], next_cursor=next_cursor,
+    # )
+    if not recent_writer:
+        page = await feed_snapshot.get_page(
+            session=session, limit=limit, cursor=page_cursor,
+        )
+    else:
+        tweets_json, next_cursor = await get_all_tweets_json(
+            session=session, limit=limit, cursor=page_cursor,
+        )
+        page = FeedPage(tweets_json=tweets_json, next_cursor=next_cursor)
+    liked_ids = await get_liked_tweet_ids(
+        session=session, user_id=user.id, tweet_ids=page.page_ids,
+    )
+
+    return Response(content=page.encode(liked_ids), media_type='application/json')
 
-    tweets_json: List[dict] = [i_tweet.to_json() for i_tweet in tweets]
-    return {'result': True, 'tweets': tweets_json}
+
+@router.get(
+        '/{id}/likes',
+        response_model=Union[sch.ResponseLikesGet, sch.ResponseError],
+)
+@query_budget(3)
+@transaction_mode('autocommit')
+async def get_likes(
+    id: int,
+    limit: int = Query(LIKES_PAGE_SIZE, ge=1, le=LIKES_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    session: AsyncSession = Depends(get_read_session),
+    user: UserPrincipal = Depends(get_user_by_api_key_dependencie),
+):
+    """Endpoint of GET-request of recieving a page of users who liked the tweet.
+
+    Users are ordered by id. Pass ``next_cursor`` of the response as
+    ``cursor`` to get the next page.
+    """
+    after_id = decode_id_cursor(cursor) if cursor else None
+    await likes_queue.sync_user(user_id=user.id)
+    likes_json, next_cursor = await get_tweet_likers(
+        session=session, tweet_id=id, limit=limit, after_id=after_id,
+    )
+    if not likes_json and not await is_tweet_exist(session=session, tweet_id=id):
+        raise TweetNotFoundError(message='Tweet with the passed id is not exist')
+
+    return ORJSONResponse(
+        {'result': True, 'likes': likes_json, 'next_cursor': next_cursor},
+    )
@@ -2,7 +2,7 @@
 
 from typing import List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 from users.schemas import UserOutShortAuthor, UserOutShortLike
 
@@ -21,7 +21,8 @@ class TweetOut(BaseModel):
     content: str
     attachments: List[Optional[str]]
     author: UserOutShortAuthor
+    like_count: int
     likes: List[Optional[UserOutShortLike]]
+    liked_by_me: bool
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
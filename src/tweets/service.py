@@ -1,14 +1,39 @@
 """Module with DB-operations with tweets."""
 
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
-from sqlalchemy import select
+from sqlalchemy import (
+    JSON,
+    Column,
+    Select,
+    delete,
+    exists,
+    func,
+    literal_column,
+    select,
+    tuple_,
+    union,
+    update,
+)
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import aliased, selectinload, with_expression
 
-from tweets.models import Tweet
-from users.models import followers
+from images.models import Media, MediaFile
+from images.service import release_media_files
+from likes.models import likes
+from likes.service import select_like_count
+from timelines.models import timelines
+from trends.service import release_tweet_hashtags
+from tweets.models import LIKES_PREVIEW_SIZE, TWEETS_SEARCH_CONFIG, Tweet
+from users.models import User, followers
+from utils.pagination import cut_page, get_rank_cursor
+
+FEED_PAGE_SIZE: int = 20
+FEED_MAX_PAGE_SIZE: int = 100
+SEARCH_QUERY_MAX_LENGTH: int = 256
+SEARCH_MAX_CANDIDATES: int = 1000
 
 
 async def add_tweet_to_db(
@@ -23,7 +48,8 @@ async def add_tweet_to_db(
         timestamp=datetime.now(),
     )
     session.add(tweet_obj)
-    await session.commit()
+    # Id of the tweet is needed to link medias and fan it out
+    await session.flush()
 
     return tweet_obj
 
@@ -38,31 +64,242 @@ async def get_tweet_by_id(
     return tweet
 
 
+async def is_tweet_exist(session: AsyncSession, tweet_id: int) -> bool:
+    """Function of checking that the tweet exists."""
+    res = await session.execute(select(exists().where(Tweet.id == tweet_id)))
+    return res.scalar()
+
+
+async def delete_user_tweet(session: AsyncSession, tweet_id: int, user_id: int) -> bool:
+    """Function of deleting the tweet belonging to the user.
+
+    Likes, medias, hashtags and timelines' rows of the tweet are deleted by
+    FK-cascades, references of the tweet's medias to their files and counters
+    of its hashtags are released by the same statement. Files left without
+    references are deleted by one more statement.
+    Returns False when nothing is deleted: the tweet is not user's or not exist.
+    """
+    deleted_tweet = delete(Tweet).filter(
+        Tweet.id == tweet_id, Tweet.user_id == user_id,
+    ).returning(Tweet.id).cte('deleted_tweet')
+    released_refs = select(
+        Media.file_hash, func.min(Media.name).label('name'), func.count().label('refs'),
+    ).filter(
+        Media.tweet_id.in_(select(deleted_tweet.c.id)),
+        Media.file_hash.is_not(None),
+    ).group_by(Media.file_hash).subquery()
+    released_files = update(MediaFile).filter(
+        MediaFile.hash == released_refs.c.file_hash,
+    ).values(
+        ref_count=MediaFile.ref_count - released_refs.c.refs,
+    ).returning(
+        MediaFile.hash, MediaFile.ref_count, released_refs.c.name,
+    ).cte('released_files')
+    released_hashtags = release_tweet_hashtags(select(deleted_tweet.c.id))
+    # One row per file without references, or one row without a file
+    res = await session.execute(
+        select(deleted_tweet.c.id, released_files.c.hash, released_files.c.name).
+        outerjoin(released_files, released_files.c.ref_count == 0).
+        add_cte(released_hashtags)
+    )
+    rows = res.all()
+    unreferenced_files: List[Tuple[str, str]] = [
+        (i_hash, i_name) for _, i_hash, i_name in rows if i_hash is not None
+    ]
+    if unreferenced_files:
+        await release_media_files(session=session, files=unreferenced_files)
+    is_deleted: bool = bool(rows)
+
+    return is_deleted
+
+
+def paginate_feed_query(
+        query: Select,
+        limit: int,
+        cursor: Optional[Tuple[datetime, int]],
+        timestamp_column: Column = Tweet.timestamp,
+        id_column: Column = Tweet.id,
+) -> Select:
+    """Function of applying keyset pagination to the tweets query.
+
+    Rows are ordered by (timestamp, id) DESC, so the page is an index range scan
+    and costs the same on any page. One extra row is fetched to detect the next page.
+    """
+    if cursor:
+        query = query.filter(tuple_(timestamp_column, id_column) < tuple_(*cursor))
+
+    return query.order_by(timestamp_column.desc(), id_column.desc()).limit(limit + 1)
+
+
+def feed_entry_options() -> tuple:
+    """Function of getting loader options of tweets serialized by ``Tweet.to_json``.
+
+    Only the likers of the preview are loaded, the count is summed by the query.
+    """
+    return (
+        selectinload(Tweet.user),
+        selectinload(Tweet.likes_preview),
+        selectinload(Tweet.attachments),
+        with_expression(Tweet.total_likes, select_like_count()),
+    )
+
+
 async def get_tweets_by_following_user(
         session: AsyncSession,
         user_id: int,
-) -> List[Optional[Tweet]]:
-    """Function of getting all of tweets of followed users."""
-    subquery = select(followers.c.followed_id).filter(
-        followers.c.follower_id == user_id
-    ).subquery()
-    tweets_query = await session.execute(select(Tweet).
-                                         filter(Tweet.user_id.in_(subquery)).
-                                         options(selectinload(Tweet.user),
-                                                 selectinload(Tweet.liked_users),
-                                                 selectinload(Tweet.attachments)))
-    tweets: List[Optional[Tweet]] = tweets_query.scalars().all()
-
-    return tweets
-
-
-async def get_all_tweets(session: AsyncSession) -> List[Optional[Tweet]]:
-    """Function of getting all of tweets."""
-    tweets_query = await session.execute(select(Tweet).
-                                         order_by(Tweet.timestamp.desc()).
-                                         options(selectinload(Tweet.user),
-                                                 selectinload(Tweet.liked_users),
-                                                 selectinload(Tweet.attachments)))
-    tweets: List[Optional[Tweet]] = tweets_query.scalars().all()
-
-    return tweets
+        limit: int = FEED_PAGE_SIZE,
+        cursor: Optional[Tuple[datetime, int]] = None,
+) -> Tuple[List[Tweet], Optional[str]]:
+    """Function of getting a page of tweets of followed users and the next cursor.
+
+    The page is read from the materialized timeline and merged with tweets
+    of followed authors which were too popular to be fanned out on write.
+    """
+    timeline_query = paginate_feed_query(
+        query=select(timelines.c.tweet_id).filter(timelines.c.user_id == user_id),
+        limit=limit,
+        cursor=cursor,
+        timestamp_column=timelines.c.timestamp,
+        id_column=timelines.c.tweet_id,
+    )
+    popular_authors_query = paginate_feed_query(
+        query=select(Tweet.id).
+        join(followers, followers.c.followed_id == Tweet.user_id).
+        filter(followers.c.follower_id == user_id, Tweet.is_fanned_out.is_(False)),
+        limit=limit,
+        cursor=cursor,
+    )
+    feed_ids = union(timeline_query, popular_authors_query).subquery()
+
+    query = select(Tweet).join(feed_ids, feed_ids.c.tweet_id == Tweet.id)
+    tweets_query = await session.execute(
+        paginate_feed_query(query=query, limit=limit, cursor=cursor).
+        options(*feed_entry_options()))
+
+    return cut_page(items=tweets_query.scalars().all(), limit=limit)
+
+
+async def get_all_tweets(
+        session: AsyncSession,
+        limit: int = FEED_PAGE_SIZE,
+        cursor: Optional[Tuple[datetime, int]] = None,
+) -> Tuple[List[Tweet], Optional[str]]:
+    """Function of getting a page of all tweets and the next cursor."""
+    tweets_query = await session.execute(
+        paginate_feed_query(query=select(Tweet), limit=limit, cursor=cursor).
+        options(*feed_entry_options()))
+
+    return cut_page(items=tweets_query.scalars().all(), limit=limit)
+
+
+def select_tweets_json(likes_limit: Optional[int] = LIKES_PREVIEW_SIZE) -> Select:
+    """Function of building the query of feed entries rendered to JSON by Postgres.
+
+    Every row holds (timestamp, id, tweet), where ``tweet`` is the same dict
+    as ``Tweet.to_json`` builds: author, likes' count and preview and
+    attachments are aggregated by correlated subqueries, so a whole page costs
+    one round trip. ``likes_limit`` bounds the preview of likers, None lists
+    all of them.
+    """
+    empty_json_array = literal_column("'[]'::json")
+    liked_user = aliased(User)
+
+    attachments = select(
+        func.coalesce(
+            func.json_agg(aggregate_order_by(
+                func.concat('/static/images/', Media.name), Media.id,
+            )),
+            empty_json_array,
+        ),
+    ).filter(Media.tweet_id == Tweet.id).scalar_subquery()
+    # Likers with the least ids: a range scan of the primary key of ``likes``
+    preview = select(likes.c.user_id).filter(
+        likes.c.tweet_id == Tweet.id,
+    ).order_by(likes.c.user_id).limit(likes_limit).correlate(Tweet).subquery()
+    liked_users = select(
+        func.coalesce(
+            func.json_agg(aggregate_order_by(
+                func.json_build_object('user_id', liked_user.id, 'name', liked_user.name),
+                liked_user.id,
+            )),
+            empty_json_array,
+        ),
+    ).select_from(preview).join(
+        liked_user, liked_user.id == preview.c.user_id,
+    ).scalar_subquery()
+
+    tweet_json = func.json_build_object(
+        'id', Tweet.id,
+        'content', Tweet.content,
+        'attachments', attachments,
+        'author', func.json_build_object('id', User.id, 'name', User.name),
+        'like_count', select_like_count(),
+        'likes', liked_users,
+        type_=JSON,
+    )
+
+    return select(Tweet.timestamp, Tweet.id, tweet_json.label('tweet')).join(
+        User, User.id == Tweet.user_id,
+    )
+
+
+async def get_all_tweets_json(
+        session: AsyncSession,
+        limit: int = FEED_PAGE_SIZE,
+        cursor: Optional[Tuple[datetime, int]] = None,
+) -> Tuple[List[dict], Optional[str]]:
+    """Function of getting a page of all tweets as ready JSON-dicts and the next cursor.
+
+    Unlike ``get_all_tweets`` no ORM-objects are built: plain rows bypass
+    the identity map and ``Tweet.to_json``.
+    """
+    tweets_query = await session.execute(
+        paginate_feed_query(query=select_tweets_json(), limit=limit, cursor=cursor),
+    )
+    rows, next_cursor = cut_page(items=tweets_query.all(), limit=limit)
+
+    return [i_row.tweet for i_row in rows], next_cursor
+
+
+async def search_tweets_json(
+        session: AsyncSession,
+        text: str,
+        limit: int = FEED_PAGE_SIZE,
+        cursor: Optional[Tuple[float, int]] = None,
+) -> Tuple[List[dict], Optional[str]]:
+    """Function of getting a page of tweets matching the text and the next cursor.
+
+    The text is parsed as a web search: quoted phrases, ``or`` and ``-word``
+    are supported. Only the newest ``SEARCH_MAX_CANDIDATES`` matches are
+    ranked: rare words are found by the GIN-index of ``content_tsv``, while
+    for frequent words Postgres walks the newest tweets until it has enough
+    matches, so latency does not grow with count of matches. Tweets are
+    ordered by (rank, id) DESC and only the page is rendered to JSON as
+    the feed's entries.
+    """
+    search_config = literal_column(f"'{TWEETS_SEARCH_CONFIG}'::regconfig")
+    ts_query = func.websearch_to_tsquery(search_config, text)
+    candidates = select(Tweet.id, Tweet.content_tsv).filter(
+        Tweet.content_tsv.bool_op('@@')(ts_query),
+    ).order_by(Tweet.id.desc()).limit(SEARCH_MAX_CANDIDATES).subquery('candidates')
+
+    rank = func.ts_rank_cd(candidates.c.content_tsv, ts_query)
+    matches_query = select(candidates.c.id, rank.label('rank'))
+    if cursor:
+        matches_query = matches_query.filter(
+            tuple_(rank, candidates.c.id) < tuple_(*cursor),
+        )
+    matches = matches_query.order_by(
+        rank.desc(), candidates.c.id.desc(),
+    ).limit(limit + 1).subquery('matches')
+
+    tweets_query = await session.execute(
+        select_tweets_json().add_columns(matches.c.rank).
+        join(matches, matches.c.id == Tweet.id).
+        order_by(matches.c.rank.desc(), matches.c.id.desc()),
+    )
+    rows, next_cursor = cut_page(
+        items=tweets_query.all(), limit=limit, get_cursor=get_rank_cursor,
+    )
+
+    return [i_row.tweet for i_row in rows], next_cursor
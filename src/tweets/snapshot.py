@@ -0,0 +1,149 @@
+"""Module with the snapshot of the global feed.
+
+Pages of the global feed are the same for every reader, so they are read
+and encoded to JSON-bytes once and served as they are. Committed writes
+drop only the pages they change: a new tweet changes the first pages,
+likes and deleting change the pages holding the tweet. Dropped pages are
+rebuilt by the next reads.
+
+Entries are encoded without the reader's ``liked_by_me`` flag: the
+flags of the page are read by one statement per request and appended to
+the encoded entries, so the page is not encoded again.
+
+Every drop increments ``version``: a page read from DB concurrently with
+a write is not stored, since it could miss the write. The snapshot is not
+shared between worker processes, so pages also expire after
+``FEED_SNAPSHOT_TTL`` seconds to bound staleness of the other workers.
+"""
+
+import asyncio
+from datetime import datetime
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+import orjson
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from tweets.service import paginate_feed_query, select_tweets_json
+from utils.cache import TTLCache
+from utils.pagination import cut_page
+
+FEED_SNAPSHOT_SIZE: int = 1000
+FEED_SNAPSHOT_TTL: float = 2.0
+LIKED_BY_ME_KEY: bytes = b',"liked_by_me":'
+
+PageKey = Tuple[int, Optional[Tuple[datetime, int]]]
+
+
+class FeedPage:
+    """Encoded page of the feed with ids of tweets it is built from.
+
+    Every entry is encoded without its closing brace, ``encode`` closes it
+    by the reader's ``liked_by_me`` flag.
+    """
+
+    __slots__ = ('entries', 'next_cursor', 'tweet_ids', 'is_first')
+
+    def __init__(
+            self,
+            tweets_json: List[dict],
+            next_cursor: Optional[str],
+            tweet_ids: FrozenSet[int] = frozenset(),
+            is_first: bool = False,
+    ):
+        self.entries: List[Tuple[int, bytes]] = [
+            (i_tweet['id'], orjson.dumps(i_tweet)[:-1] + LIKED_BY_ME_KEY)
+            for i_tweet in tweets_json
+        ]
+        self.next_cursor: bytes = orjson.dumps(next_cursor)
+        # The extra row fetched to detect the next page is included
+        self.tweet_ids = tweet_ids
+        self.is_first = is_first
+
+    @property
+    def page_ids(self) -> List[int]:
+        """Ids of the tweets of the page, in order of the feed."""
+        return [i_tweet_id for i_tweet_id, _ in self.entries]
+
+    def encode(self, liked_ids: Set[int]) -> bytes:
+        """Function of encoding the page as the response of ``GET /tweets``."""
+        tweets: bytes = b','.join([
+            i_entry + (b'true}' if i_tweet_id in liked_ids else b'false}')
+            for i_tweet_id, i_entry in self.entries
+        ])
+        return b''.join([
+            b'{"result":true,"tweets":[', tweets, b'],"next_cursor":',
+            self.next_cursor, b'}',
+        ])
+
+
+class FeedSnapshot:
+    """Encoded pages of the global feed by (limit, cursor)."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.version: int = 0
+        self.pages: TTLCache[FeedPage] = TTLCache(maxsize=maxsize, ttl=ttl)
+        # Concurrent reads of a missing first page wait for one of them to build it
+        self._first_page_locks: Dict[int, asyncio.Lock] = {}
+
+    async def get_page(
+            self,
+            session: AsyncSession,
+            limit: int,
+            cursor: Optional[Tuple[datetime, int]] = None,
+    ) -> FeedPage:
+        """Function of getting the page, it is built when it is missing."""
+        key: PageKey = (limit, cursor)
+        page: Optional[FeedPage] = self.pages.get(key)
+        if page is not None:
+            return page
+
+        if cursor is not None:
+            return await self.build_page(session=session, key=key)
+
+        lock: asyncio.Lock = self._first_page_locks.setdefault(limit, asyncio.Lock())
+        async with lock:
+            page = self.pages.get(key)
+            if page is not None:
+                return page
+            return await self.build_page(session=session, key=key)
+
+    async def build_page(self, session: AsyncSession, key: PageKey) -> FeedPage:
+        """Function of reading and encoding the page.
+
+        The page is stored unless a write has happened while it was read.
+        """
+        version: int = self.version
+        limit, cursor = key
+        tweets_query = await session.execute(
+            paginate_feed_query(query=select_tweets_json(), limit=limit, cursor=cursor),
+        )
+        rows: List = tweets_query.all()
+        page_rows, next_cursor = cut_page(items=rows, limit=limit)
+        page = FeedPage(
+            tweets_json=[i_row.tweet for i_row in page_rows],
+            next_cursor=next_cursor,
+            tweet_ids=frozenset(i_row.id for i_row in rows),
+            is_first=cursor is None,
+        )
+
+        if version == self.version:
+            self.pages.set(key, page)
+        return page
+
+    def on_tweet_created(self) -> None:
+        """Function of dropping the pages a new tweet appears on: the first ones."""
+        self.version += 1
+        self.pages.invalidate_values(lambda page: page.is_first)
+
+    def on_tweet_changed(self, tweet_id: int) -> None:
+        """Function of dropping the pages holding the changed or deleted tweet."""
+        self.version += 1
+        self.pages.invalidate_values(lambda page: tweet_id in page.tweet_ids)
+
+    def clear(self) -> None:
+        """Function of dropping all of pages."""
+        self.version += 1
+        self.pages.clear()
+
+
+feed_snapshot = FeedSnapshot(maxsize=FEED_SNAPSHOT_SIZE, ttl=FEED_SNAPSHOT_TTL)
@@ -2,7 +2,7 @@
 
 from typing import Dict, Optional
 
-from sqlalchemy import Column, String, Integer, ForeignKey, Table
+from sqlalchemy import Column, String, Index, Integer, ForeignKey, Table
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import relationship, backref, selectinload
@@ -17,8 +17,9 @@ API_KEY_SIZE: int = 16
 followers = Table(
     'followers',
     Base.metadata,
-    Column('follower_id', Integer, ForeignKey('users.id')),
-    Column('followed_id', Integer, ForeignKey('users.id')),
+    Column('follower_id', Integer, ForeignKey('users.id'), primary_key=True),
+    Column('followed_id', Integer, ForeignKey('users.id'), primary_key=True),
+    Index('ix_followers_followed_id_follower_id', 'followed_id', 'follower_id'),
 )
 
 
@@ -30,6 +31,7 @@ class User(Base):
     id = Column(Integer, primary_key=True)
     name = Column(String, nullable=False)
     api_key = Column(String, nullable=False, unique=True)
+    followers_count = Column(Integer, nullable=False, default=0, server_default='0')
     followed = relationship(
         'User',
         secondary=followers,
@@ -47,8 +49,12 @@ class User(Base):
         return {
             'id': self.id,
             'name': self.name,
-            'followers': self.followers,
-            'following': self.followed,
+            'followers': [
+                {'id': i_user.id, 'name': i_user.name} for i_user in self.followers
+            ],
+            'following': [
+                {'id': i_user.id, 'name': i_user.name} for i_user in self.followed
+            ],
         }
 
     def __repr__(self):
@@ -60,28 +66,10 @@ class User(Base):
         session: AsyncSession,
         user_id: str,
     ) -> Optional['User']:
-        """Function of getting the user by id."""
+        """Function of getting the user by id with followers and followed users."""
         res = await session.execute(select(User).
                                     filter_by(id=user_id).
-                                    options(selectinload(User.tweets),
-                                            selectinload(User.liked_tweets),
-                                            selectinload(User.followed),
-                                            selectinload(User.followers)))
-
-        return res.unique().scalars().one_or_none()
-
-    @classmethod
-    async def get_user_by_api_key(
-        cls,
-        session: AsyncSession,
-        api_key: str,
-    ) -> Optional['User']:
-        """Function of getting the user by api-key."""
-        res = await session.execute(select(User).
-                                    filter_by(api_key=api_key).
-                                    options(selectinload(User.tweets),
-                                            selectinload(User.liked_tweets),
-                                            selectinload(User.followed),
+                                    options(selectinload(User.followed),
                                             selectinload(User.followers)))
 
         return res.unique().scalars().one_or_none()
@@ -100,5 +88,5 @@ class User(Base):
         new_user = User(name=user_name, api_key=api_key)
 
         session.add(new_user)
-        await session.commit()
+        await session.flush()
         return new_user
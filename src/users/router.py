@@ -3,16 +3,29 @@
 from typing import Optional, Union
 
 from fastapi import APIRouter, Depends
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from dependencies import get_session, get_user_by_api_key_dependencie
+from dependencies import (
+    get_read_session,
+    get_session,
+    get_user_by_api_key_dependencie,
+    transaction_mode,
+)
 from exceptions import RelationshipError
-
+from metrics.service import query_budget
+from timelines.service import backfill_timeline, prune_timeline
 from users.exceptions import UserNotFoundError
 from utils.global_schemas import ResponseError, BaseResponse, ResponseUserGet
 from users.models import User
-from users.schemas import UserOutShortAuthor
-from users.service import get_user_by_id, create_user
+from users.schemas import UserOutShortAuthor, UserPrincipal
+from users.service import (
+    add_following,
+    create_user,
+    delete_following,
+    get_user_by_id,
+    is_user_exist,
+)
 
 router = APIRouter(prefix='/users', tags=['Users'])
 
@@ -21,79 +34,98 @@ router = APIRouter(prefix='/users', tags=['Users'])
         '/{id}/follow',
         response_model=Union[BaseResponse, ResponseError],
 )
+@query_budget(3)
 async def follow(
     id: int,
     session: AsyncSession = Depends(get_session),
-    current_user: User = Depends(get_user_by_api_key_dependencie),
+    current_user: UserPrincipal = Depends(get_user_by_api_key_dependencie),
 ):
     """Endpoint of POST-request of following some user."""
-    other_user: Optional[User] = await get_user_by_id(session=session, user_id=id)
-    if not other_user:
+    if await add_following(session=session, follower_id=current_user.id, followed_id=id):
+        await backfill_timeline(session=session, user_id=current_user.id, followed_id=id)
+        return {'result': True}
+
+    if not await is_user_exist(session=session, user_id=id):
         raise UserNotFoundError(message='User with passed id is not exist')
 
-    if other_user in current_user.followed:
-        raise RelationshipError(message='You are already follow this user')
-    else:
-        current_user.followed.append(other_user)
-        await session.commit()
-        return {'result': True}
+    raise RelationshipError(message='You are already follow this user')
 
 
 @router.delete(
         '/{id}/follow',
         response_model=Union[BaseResponse, ResponseError],
 )
+@query_budget(3)
 async def unfollow(
     id: int,
     session: AsyncSession = Depends(get_session),
-    current_user: User = Depends(get_user_by_api_key_dependencie),
+    current_user: UserPrincipal = Depends(get_user_by_api_key_dependencie),
 ):
     """Endpoint of DELETE-request of unfollowing some user."""
-    other_user: Optional[User] = await get_user_by_id(session=session, user_id=id)
-    if not other_user:
+    is_deleted: bool = await delete_following(
+        session=session, follower_id=current_user.id, followed_id=id,
+    )
+    if is_deleted:
+        await prune_timeline(session=session, user_id=current_user.id, followed_id=id)
+        return {'result': True}
+
+    if not await is_user_exist(session=session, user_id=id):
         raise UserNotFoundError(message='User with passed id is not exist')
 
-    if other_user not in current_user.followed:
-        raise RelationshipError(message='You are not already follow this user')
-    else:
-        current_user.followed.remove(other_user)
-        await session.commit()
-        return {'result': True}
+    raise RelationshipError(message='You are not already follow this user')
 
 
 @router.get(
         '/me',
         response_model=Union[ResponseUserGet, ResponseError],
 )
+@query_budget(5)
+@transaction_mode('autocommit')
 async def get_info_me(
-    session: AsyncSession = Depends(get_session),
-    user: User = Depends(get_user_by_api_key_dependencie),
+    session: AsyncSession = Depends(get_read_session),
+    primary_session: AsyncSession = Depends(get_session),
+    user: UserPrincipal = Depends(get_user_by_api_key_dependencie),
 ):
-    """Endpoint of GET-request of getting current user's information."""
-    return {'result': True, 'user': user.to_json()}
+    """Endpoint of GET-request of getting current user's information.
+
+    The user is authenticated by the primary, a replica may not have it yet:
+    the user created by another worker, or before the api-key was used for
+    writes, is not known as recent writer. Then the user is read from the
+    primary.
+    """
+    user_obj: Optional[User] = await get_user_by_id(session=session, user_id=user.id)
+    if user_obj is None and session is not primary_session:
+        user_obj = await get_user_by_id(session=primary_session, user_id=user.id)
+    if user_obj is None:
+        raise UserNotFoundError(message='User with the passed api-key is not exist')
+
+    return ORJSONResponse({'result': True, 'user': user_obj.to_json()})
 
 
 @router.get(
         '/{id}',
         response_model=Union[ResponseUserGet, ResponseError],
 )
+@query_budget(4)
+@transaction_mode('autocommit')
 async def get_info_user(
     id: int,
-    session: AsyncSession = Depends(get_session),
-    current_user: User = Depends(get_user_by_api_key_dependencie),
+    session: AsyncSession = Depends(get_read_session),
+    current_user: UserPrincipal = Depends(get_user_by_api_key_dependencie),
 ):
     """Endpoint of GET-request of getting some user's information."""
     user: Optional[User] = await get_user_by_id(session=session, user_id=id)
     if not user:
         raise UserNotFoundError(message='User with passed id is not exist')
 
-    return {'result': True, 'user': user.to_json()}
+    return ORJSONResponse({'result': True, 'user': user.to_json()})
 
 
 @router.post(
         '/{name}',
         response_model=Union[UserOutShortAuthor, ResponseError],
 )
+@query_budget(2)
 async def add_user(
     name: str,
     session: AsyncSession = Depends(get_session),
@@ -2,7 +2,7 @@
 
 from typing import List
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 
 class UserOutShort(BaseModel):
@@ -11,13 +11,18 @@ class UserOutShort(BaseModel):
     name: str
 
 
+class UserPrincipal(UserOutShort):
+    """Scheme of authenticated user. Only identity, without relationships."""
+
+    id: int
+
+
 class UserOutShortAuthor(UserOutShort):
     """GET-request output scheme of "User" model realization. Short version. Author."""
 
     id: int
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class UserOutShortLike(UserOutShort):
@@ -2,17 +2,47 @@
 
 from typing import Optional
 
-from sqlalchemy import select
+from sqlalchemy import CTE, Update, delete, exists, literal, select, update
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
+
+from users.models import User, followers
+from users.schemas import UserPrincipal
+from utils.cache import TTLCache
 from utils.keys_generator import generate_key
-from users.models import User
 
+PRINCIPALS_CACHE_SIZE: int = 10000
+PRINCIPALS_CACHE_TTL: float = 60.0
 
-async def get_user_by_api_key(session: AsyncSession, api_key: str) -> Optional[User]:
-    """Function of getting user by api-key."""
-    user = await User.get_user_by_api_key(session=session, api_key=api_key)
+# Authenticated users by api-key. Entries must be invalidated when user's
+# identity (api-key or name) changes.
+principals_cache: TTLCache[UserPrincipal] = TTLCache(
+    maxsize=PRINCIPALS_CACHE_SIZE, ttl=PRINCIPALS_CACHE_TTL,
+)
 
-    return user
+
+async def get_principal_by_api_key(
+        session: AsyncSession,
+        api_key: str,
+) -> Optional[UserPrincipal]:
+    """Function of getting authenticated user by api-key. Cached."""
+    principal: Optional[UserPrincipal] = principals_cache.get(api_key)
+    if principal:
+        return principal
+
+    res = await session.execute(select(User.id, User.name).filter_by(api_key=api_key))
+    user_row = res.one_or_none()
+    if not user_row:
+        return None
+
+    principal = UserPrincipal(id=user_row.id, name=user_row.name)
+    principals_cache.set(api_key, principal)
+    return principal
+
+
+def invalidate_principal(api_key: str) -> None:
+    """Function of dropping cached authenticated user by api-key."""
+    principals_cache.invalidate(api_key)
 
 
 async def get_user_by_id(session: AsyncSession, user_id: int) -> Optional[User]:
@@ -22,18 +52,75 @@ async def get_user_by_id(session: AsyncSession, user_id: int) -> Optional[User]:
     return user
 
 
+async def is_user_exist(session: AsyncSession, user_id: int) -> bool:
+    """Function of checking that the user exists."""
+    res = await session.execute(select(exists().where(User.id == user_id)))
+    return res.scalar()
+
+
+def update_followers_count(changed_followings: CTE, delta: int) -> Update:
+    """Function of building statement of changing counter of user's followers.
+
+    The counter changes only for rows really inserted or deleted by the CTE.
+    """
+    return update(User).filter(
+        User.id == changed_followings.c.followed_id,
+    ).values(
+        followers_count=User.followers_count + delta,
+    ).returning(User.id).execution_options(synchronize_session=False)
+
+
+async def add_following(
+        session: AsyncSession,
+        follower_id: int,
+        followed_id: int,
+) -> bool:
+    """Function of adding following of other existing user.
+
+    Returns False when nothing is added: the user is already followed or not exist.
+    """
+    following_query = select(literal(follower_id), literal(followed_id)).filter(
+        exists().where(User.id == followed_id),
+    )
+    added_following = insert(followers).from_select(
+        ['follower_id', 'followed_id'], following_query,
+    ).on_conflict_do_nothing().returning(followers.c.followed_id).cte('added_following')
+    res = await session.execute(update_followers_count(added_following, delta=1))
+    is_added: bool = res.first() is not None
+
+    return is_added
+
+
+async def delete_following(
+        session: AsyncSession,
+        follower_id: int,
+        followed_id: int,
+) -> bool:
+    """Function of deleting following of other user.
+
+    Returns False when the user is not followed.
+    """
+    deleted_following = delete(followers).filter(
+        followers.c.follower_id == follower_id,
+        followers.c.followed_id == followed_id,
+    ).returning(followers.c.followed_id).cte('deleted_following')
+    res = await session.execute(update_followers_count(deleted_following, delta=-1))
+    is_deleted: bool = res.first() is not None
+
+    return is_deleted
+
+
 async def create_user(session: AsyncSession, name: str, api_key_len: int) -> User:
     """Function of creating user with name."""
-    users = await session.execute(select(User))
-    users = users.scalars().all()
+    users_exist = await session.execute(select(select(User.id).exists()))
 
-    if users:
+    if users_exist.scalar():
         api_key = generate_key(length=api_key_len)
     else:
         api_key = 'test'
 
     user = User(name=name, api_key=api_key)
     session.add(user)
-    await session.commit()
+    await session.flush()
 
     return user
@@ -0,0 +1,58 @@
+"""Module with in-process caches."""
+
+import time
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, Optional, Tuple, TypeVar
+
+Value = TypeVar('Value')
+
+
+class TTLCache(Generic[Value]):
+    """LRU-cache with expiring entries.
+
+    Entries live for ``ttl`` seconds; above ``maxsize`` entries the least
+    recently used ones are evicted. Not shared between worker processes.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: 'OrderedDict[Hashable, Tuple[float, Value]]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Value]:
+        """Function of getting alive value by key."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Value) -> None:
+        """Function of putting value by key."""
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        """Function of deleting value by key."""
+        self._entries.pop(key, None)
+
+    def invalidate_values(self, predicate: Callable[[Value], bool]) -> None:
+        """Function of deleting values matching the predicate."""
+        for i_key, (_, i_value) in list(self._entries.items()):
+            if predicate(i_value):
+                del self._entries[i_key]
+
+    def clear(self) -> None:
+        """Function of deleting all of values."""
+        self._entries.clear()
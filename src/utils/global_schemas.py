@@ -1,11 +1,12 @@
 """Module with common validation schemes."""
 
-from typing import List
+from typing import List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
+from trends.schemas import TrendOut
 from tweets.schemas import TweetOut
-from users.schemas import UserOutFull
+from users.schemas import UserOutFull, UserOutShortLike
 
 
 class BaseResponse(BaseModel):
@@ -19,8 +20,7 @@ class ResponseTweetPost(BaseResponse):
 
     tweet_id: int
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class ResponseMediaPost(BaseResponse):
@@ -28,14 +28,34 @@ class ResponseMediaPost(BaseResponse):
 
     media_id: int
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ResponseMediasPost(BaseResponse):
+    """Output scheme of response while posting batch of new medias."""
+
+    media_ids: List[int]
 
 
 class ResponseTweetsGet(BaseResponse):
     """Output scheme of response while getting tweets of user's feed."""
 
     tweets: List[TweetOut]
+    next_cursor: Optional[str] = None
+
+
+class ResponseLikesGet(BaseResponse):
+    """Output scheme of response while getting users who liked the tweet."""
+
+    likes: List[UserOutShortLike]
+    next_cursor: Optional[str] = None
+
+
+class ResponseTrendsGet(BaseResponse):
+    """Output scheme of response while getting trends of hashtags."""
+
+    window: str
+    trends: List[TrendOut]
 
 
 class ResponseError(BaseResponse):
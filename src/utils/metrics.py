@@ -0,0 +1,185 @@
+"""Module with in-process metrics in Prometheus text format.
+
+Metrics are plain counters updated from the event loop thread, so
+recording a value costs a couple of dict operations. Values are not
+shared between worker processes: every worker is scraped by itself.
+"""
+
+from bisect import bisect_left
+from typing import Dict, List, Sequence, Tuple
+
+Labels = Tuple[str, ...]
+
+LABEL_VALUE_ESCAPES: dict = str.maketrans({'\\': '\\\\', '"': '\\"', '\n': '\\n'})
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+def format_labels(names: Sequence[str], values: Labels) -> str:
+    """Function of rendering labels of the series: ``{name="value",...}``."""
+    if not names:
+        return ''
+    pairs: List[str] = []
+    for i_name, i_value in zip(names, values):
+        i_value = str(i_value).translate(LABEL_VALUE_ESCAPES)
+        pairs.append(f'{i_name}="{i_value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def format_value(value: float) -> str:
+    """Function of rendering value of the series."""
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class Counter:
+    """Monotonically increasing value by labels."""
+
+    metric_type: str = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames: Tuple[str, ...] = tuple(labelnames)
+        # Metric without labels is exported as zero before the first update
+        self._values: Dict[Labels, float] = {} if self.labelnames else {(): 0.0}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        """Function of increasing value of the series."""
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def get(self, *labels: str) -> float:
+        """Function of getting value of the series."""
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> List[str]:
+        """Function of rendering the metric's lines."""
+        lines: List[str] = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.metric_type}',
+        ]
+        for i_labels, i_value in self._values.items():
+            lines.append(
+                f'{self.name}{format_labels(self.labelnames, i_labels)} '
+                f'{format_value(i_value)}'
+            )
+        return lines
+
+
+class Gauge(Counter):
+    """Value going up and down by labels."""
+
+    metric_type: str = 'gauge'
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        """Function of decreasing value of the series."""
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels: str, value: float) -> None:
+        """Function of setting value of the series."""
+        self._values[labels] = value
+
+
+class Histogram:
+    """Distribution of observed values by buckets and labels."""
+
+    metric_type: str = 'histogram'
+
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            labelnames: Sequence[str] = (),
+            buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames: Tuple[str, ...] = tuple(labelnames)
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets)) + (float('inf'),)
+        # Series: not cumulative counts of buckets, sum and count of values
+        self._series: Dict[Labels, List] = {}
+        if not self.labelnames:
+            self._series[()] = [[0] * len(self.buckets), 0.0, 0]
+
+    def observe(self, *labels: str, value: float) -> None:
+        """Function of adding the value to the series."""
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def get_count(self, *labels: str) -> int:
+        """Function of getting count of values of the series."""
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def get_sum(self, *labels: str) -> float:
+        """Function of getting sum of values of the series."""
+        series = self._series.get(labels)
+        return series[1] if series else 0.0
+
+    def render(self) -> List[str]:
+        """Function of rendering the metric's lines."""
+        lines: List[str] = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.metric_type}',
+        ]
+        bucket_labelnames: Tuple[str, ...] = self.labelnames + ('le',)
+        for i_labels, (i_counts, i_sum, i_count) in self._series.items():
+            cumulative: int = 0
+            for i_bound, i_bucket_count in zip(self.buckets, i_counts):
+                cumulative += i_bucket_count
+                bucket_labels: str = format_labels(
+                    bucket_labelnames, i_labels + (format_value(i_bound),),
+                )
+                lines.append(f'{self.name}_bucket{bucket_labels} {cumulative}')
+            labels: str = format_labels(self.labelnames, i_labels)
+            lines.append(f'{self.name}_sum{labels} {format_value(i_sum)}')
+            lines.append(f'{self.name}_count{labels} {i_count}')
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        """Function of registering counter."""
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        """Function of registering gauge."""
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+            self,
+            name: str,
+            documentation: str,
+            labelnames: Sequence[str] = (),
+            buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        """Function of registering histogram."""
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def register(self, metric):
+        """Function of adding the metric, names are unique."""
+        if metric.name in self._metrics:
+            raise ValueError(f'Metric {metric.name} is already registered')
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Function of rendering all of metrics in Prometheus text format."""
+        lines: List[str] = []
+        for i_metric in self._metrics.values():
+            lines.extend(i_metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
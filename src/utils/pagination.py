@@ -0,0 +1,89 @@
+"""Module with keyset (cursor) pagination helpers."""
+
+import base64
+import binascii
+from datetime import datetime
+from typing import Callable, List, Optional, Sequence, Tuple, TypeVar
+
+from exceptions import InvalidCursorError
+
+CURSOR_SEPARATOR: str = '|'
+
+Item = TypeVar('Item')
+
+
+def encode_cursor(timestamp: datetime, item_id: int) -> str:
+    """Function of packing (timestamp, id) pair into opaque cursor."""
+    raw_cursor: str = CURSOR_SEPARATOR.join([timestamp.isoformat(), str(item_id)])
+    return base64.urlsafe_b64encode(raw_cursor.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Function of unpacking opaque cursor into (timestamp, id) pair."""
+    try:
+        raw_cursor: str = base64.urlsafe_b64decode(cursor.encode()).decode()
+        raw_timestamp, raw_id = raw_cursor.split(CURSOR_SEPARATOR)
+        return datetime.fromisoformat(raw_timestamp), int(raw_id)
+    except (binascii.Error, UnicodeError, ValueError):
+        raise InvalidCursorError(message='Passed cursor is invalid')
+
+
+def encode_rank_cursor(rank: float, item_id: int) -> str:
+    """Function of packing (rank, id) pair of ranked results into opaque cursor."""
+    raw_cursor: str = CURSOR_SEPARATOR.join([repr(rank), str(item_id)])
+    return base64.urlsafe_b64encode(raw_cursor.encode()).decode()
+
+
+def decode_rank_cursor(cursor: str) -> Tuple[float, int]:
+    """Function of unpacking opaque cursor into (rank, id) pair."""
+    try:
+        raw_cursor: str = base64.urlsafe_b64decode(cursor.encode()).decode()
+        raw_rank, raw_id = raw_cursor.split(CURSOR_SEPARATOR)
+        return float(raw_rank), int(raw_id)
+    except (binascii.Error, UnicodeError, ValueError):
+        raise InvalidCursorError(message='Passed cursor is invalid')
+
+
+def encode_id_cursor(item_id: int) -> str:
+    """Function of packing id of items ordered by id into opaque cursor."""
+    return base64.urlsafe_b64encode(str(item_id).encode()).decode()
+
+
+def decode_id_cursor(cursor: str) -> int:
+    """Function of unpacking opaque cursor into id."""
+    try:
+        return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (binascii.Error, UnicodeError, ValueError):
+        raise InvalidCursorError(message='Passed cursor is invalid')
+
+
+def get_timestamp_cursor(item) -> str:
+    """Function of building cursor of the item of a feed."""
+    return encode_cursor(timestamp=item.timestamp, item_id=item.id)
+
+
+def get_rank_cursor(item) -> str:
+    """Function of building cursor of the item of ranked results."""
+    return encode_rank_cursor(rank=item.rank, item_id=item.id)
+
+
+def get_id_cursor(item) -> str:
+    """Function of building cursor of the item of a list ordered by id."""
+    return encode_id_cursor(item_id=item.id)
+
+
+def cut_page(
+        items: Sequence[Item],
+        limit: int,
+        get_cursor: Callable[[Item], str] = get_timestamp_cursor,
+) -> Tuple[List[Item], Optional[str]]:
+    """Function of cutting the extra fetched item and building the next page cursor.
+
+    Queries fetch ``limit + 1`` rows: the extra row only signals that one more
+    page exists and is never returned to the client.
+    """
+    page: List[Item] = list(items[:limit])
+    if len(items) <= limit or not page:
+        return page, None
+
+    return page, get_cursor(page[-1])
@@ -0,0 +1,158 @@
+"""Module with query-plan regression tests.
+
+Every statement of the service layer is captured while running against
+a seeded database and then explained with sequential scans disabled:
+a ``Seq Scan`` left in the plan means there is no usable index for it.
+"""
+
+import json
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Iterator, List, Tuple
+
+import pytest
+from sqlalchemy import event, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from images.models import Media
+from likes import service as likes_srv
+from likes.models import likes
+from timelines import service as timelines_srv
+from tweets import service as tweets_srv
+from tweets.models import Tweet
+from users import service as users_srv
+from users.models import User, followers
+
+SEED_USERS: int = 50
+SEED_TWEETS: int = 500
+
+
+@pytest.fixture(scope='function')
+async def seeded_db(db: AsyncSession) -> AsyncSession:
+    """Function of filling DB with users, tweets, likes, follows and medias."""
+    await db.execute(insert(User), [
+        {'name': f'user_{i_user}', 'api_key': f'key_{i_user}'}
+        for i_user in range(1, SEED_USERS + 1)
+    ])
+    started_at = datetime(2024, 1, 1)
+    await db.execute(insert(Tweet), [
+        {
+            'content': f'tweet {i_tweet}',
+            'user_id': i_tweet % SEED_USERS + 1,
+            'timestamp': started_at + timedelta(minutes=i_tweet),
+        }
+        for i_tweet in range(SEED_TWEETS)
+    ])
+    await db.execute(insert(Media), [
+        {'name': f'{i_tweet}.jpeg', 'tweet_id': i_tweet}
+        for i_tweet in range(1, SEED_TWEETS + 1, 5)
+    ])
+    await db.execute(insert(likes), [
+        {'tweet_id': i_tweet, 'user_id': i_user}
+        for i_tweet in range(1, SEED_TWEETS + 1)
+        for i_user in range(1, i_tweet % 7 + 1)
+    ])
+    await db.execute(insert(followers), [
+        {'follower_id': i_user, 'followed_id': i_followed}
+        for i_user in range(1, SEED_USERS + 1)
+        for i_followed in range(1, SEED_USERS + 1, 3) if i_user != i_followed
+    ])
+    await db.commit()
+    return db
+
+
+@contextmanager
+def capture_statements(session: AsyncSession) -> Iterator[List[Tuple[str, tuple]]]:
+    """Function of collecting SQL-statements executed through the session's engine."""
+    statements: List[Tuple[str, tuple]] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    sync_engine = session.bind.sync_engine
+    event.listen(sync_engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(sync_engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def find_seq_scans(plan: dict) -> List[str]:
+    """Function of collecting relations read by sequential scans in the plan."""
+    seq_scans: List[str] = []
+    if plan.get('Node Type') == 'Seq Scan':
+        seq_scans.append(plan.get('Relation Name'))
+    for i_subplan in plan.get('Plans', []):
+        seq_scans.extend(find_seq_scans(i_subplan))
+    return seq_scans
+
+
+async def assert_index_only_plans(session: AsyncSession, statements: list) -> None:
+    """Function of explaining statements and failing on sequential scans."""
+    assert statements
+    async with session.bind.connect() as conn:
+        await conn.exec_driver_sql('SET enable_seqscan = off')
+        for i_statement, i_parameters in statements:
+            res = await conn.exec_driver_sql(
+                f'EXPLAIN (FORMAT JSON) {i_statement}', i_parameters,
+            )
+            plan = res.scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            seq_scans = find_seq_scans(plan[0]['Plan'])
+            assert not seq_scans, f'Seq Scan on {seq_scans} in: {i_statement}'
+
+
+class TestQueryPlans:
+    """Class with tests of index usage by service queries."""
+
+    async def test_feed_queries(self, seeded_db: AsyncSession):
+        """Function for testing plans of global and following feeds."""
+        with capture_statements(seeded_db) as statements:
+            _, next_cursor = await tweets_srv.get_all_tweets_json(session=seeded_db)
+            await tweets_srv.get_all_tweets_json(
+                session=seeded_db, cursor=(datetime(2024, 1, 2), 100),
+            )
+            await tweets_srv.get_all_tweets(session=seeded_db)
+            await tweets_srv.get_tweets_by_following_user(session=seeded_db, user_id=1)
+            await tweets_srv.get_tweet_by_id(session=seeded_db, tweet_id=10)
+
+        await assert_index_only_plans(seeded_db, statements)
+
+    async def test_user_queries(self, seeded_db: AsyncSession):
+        """Function for testing plans of users' and follows' queries."""
+        with capture_statements(seeded_db) as statements:
+            await users_srv.get_principal_by_api_key(session=seeded_db, api_key='key_1')
+            await users_srv.get_user_by_id(session=seeded_db, user_id=2)
+            await users_srv.is_user_exist(session=seeded_db, user_id=4)
+            await users_srv.add_following(session=seeded_db, follower_id=1, followed_id=5)
+            await users_srv.delete_following(
+                session=seeded_db, follower_id=1, followed_id=4,
+            )
+            await users_srv.create_user(session=seeded_db, name='new', api_key_len=7)
+
+        await assert_index_only_plans(seeded_db, statements)
+
+    async def test_like_queries(self, seeded_db: AsyncSession):
+        """Function for testing plans of likes' queries."""
+        with capture_statements(seeded_db) as statements:
+            await likes_srv.add_like(session=seeded_db, tweet_id=1, user_id=1)
+            await likes_srv.delete_like(session=seeded_db, tweet_id=6, user_id=1)
+            await tweets_srv.is_tweet_exist(session=seeded_db, tweet_id=6)
+
+        await assert_index_only_plans(seeded_db, statements)
+
+    async def test_timeline_queries(self, seeded_db: AsyncSession):
+        """Function for testing plans of home timelines' queries."""
+        tweet = await tweets_srv.get_tweet_by_id(session=seeded_db, tweet_id=1)
+        with capture_statements(seeded_db) as statements:
+            await timelines_srv.fan_out_tweet(session=seeded_db, tweet=tweet)
+            await timelines_srv.backfill_timeline(
+                session=seeded_db, user_id=2, followed_id=1,
+            )
+            await timelines_srv.prune_timeline(
+                session=seeded_db, user_id=2, followed_id=1,
+            )
+            await tweets_srv.delete_user_tweet(session=seeded_db, tweet_id=1, user_id=2)
+
+        await assert_index_only_plans(seeded_db, statements)